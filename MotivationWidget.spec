@@ -6,7 +6,7 @@ a = Analysis(
     pathex=[],
     binaries=[],
     datas=[],
-    hiddenimports=['win32com.client'],
+    hiddenimports=['win32com.client', 'PIL.Image', 'PIL.ImageTk', 'http.client', 'urllib.parse'],
     hookspath=[],
     hooksconfig={},
     runtime_hooks=[],
@@ -0,0 +1,95 @@
+"""Compare per-frame latency and peak memory of the old and new scaling paths.
+
+Usage:
+    python benchmarks/bench_scaling.py [folder] [--size 800x600] [--repeat 5]
+
+Each variant runs in a fresh subprocess so its peak memory is measured on
+its own. The default folder is sample_images/; point it at a folder of
+camera JPEGs to see the effect of draft-mode decoding on large files.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from PIL import Image
+
+from motivation_widget import (RESAMPLE_FILTERS, VALID_EXTENSIONS, fit_size, peak_rss_bytes,
+                               render_image)
+
+VARIANTS = ['baseline'] + list(RESAMPLE_FILTERS)
+
+
+def render_baseline(image_path, size):
+    """The original show_image path: full decode followed by a single LANCZOS resize"""
+    with Image.open(image_path) as img:
+        new_size = fit_size(img.width, img.height, size[0], size[1])
+        return img.resize(new_size, Image.Resampling.LANCZOS)
+
+
+def run_variant(variant, paths, size, repeat):
+    """Render every path repeat times and return timing and memory figures"""
+    start_rss = peak_rss_bytes()
+    timings = []
+    for _ in range(repeat):
+        for path in paths:
+            start = time.perf_counter()
+            if variant == 'baseline':
+                render_baseline(path, size)
+            else:
+                render_image(path, size, variant)
+            timings.append((time.perf_counter() - start) * 1000)
+    return {
+        'variant': variant,
+        'frames': len(timings),
+        'mean_ms': statistics.mean(timings),
+        'median_ms': statistics.median(timings),
+        'max_ms': max(timings),
+        'peak_rss_mb': peak_rss_bytes() / (1024 * 1024),
+        'start_rss_mb': start_rss / (1024 * 1024),
+    }
+
+
+def main():
+    default_folder = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                                  'sample_images')
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('folder', nargs='?', default=default_folder)
+    parser.add_argument('--size', default='800x600', help='target box as WIDTHxHEIGHT')
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--variant', choices=VARIANTS, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    size = tuple(int(v) for v in args.size.lower().split('x'))
+    paths = sorted(
+        entry.path for entry in os.scandir(args.folder)
+        if entry.is_file() and os.path.splitext(entry.name.lower())[1] in VALID_EXTENSIONS
+    )
+    if not paths:
+        sys.exit(f"No images found in {args.folder}")
+
+    # Child process: measure a single variant and report back as JSON
+    if args.variant:
+        print(json.dumps(run_variant(args.variant, paths, size, args.repeat)))
+        return
+
+    print(f"{len(paths)} images from {args.folder}, target {size[0]}x{size[1]}, "
+          f"{args.repeat} passes")
+    print(f"{'variant':<10} {'mean ms':>9} {'median ms':>10} {'max ms':>8} {'peak RSS MB':>12}")
+    for variant in VARIANTS:
+        output = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), args.folder, '--size', args.size,
+             '--repeat', str(args.repeat), '--variant', variant],
+            check=True, capture_output=True, text=True).stdout
+        result = json.loads(output)
+        print(f"{variant:<10} {result['mean_ms']:>9.2f} {result['median_ms']:>10.2f} "
+              f"{result['max_ms']:>8.2f} {result['peak_rss_mb']:>12.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,92 @@
+"""Soak test: run thousands of transitions through the frame presenter and check RSS stays flat.
+
+Usage:
+    python benchmarks/soak_presenter.py [folder] [--transitions 2000] [--steps 12]
+                                        [--size 800x600] [--style crossfade] [--allocate]
+
+Transition steps are shown back to back without waiting for the frame rate,
+and Tk is given a chance to draw after every transition. RSS is sampled
+every 100 transitions; the first tenth of the run is treated as warm-up.
+--allocate creates a new PhotoImage for every step, as the widget did
+before FramePresenter, for comparison. Needs a display.
+"""
+import argparse
+import itertools
+import os
+import sys
+import time
+import tkinter as tk
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from PIL import ImageTk
+
+from motivation_widget import (TRANSITION_STYLES, FramePresenter, Transition, iter_images,
+                               memory_usage, render_image)
+
+
+class AllocatingPresenter(FramePresenter):
+    """The old display path: a fresh PhotoImage for every frame"""
+
+    def show(self, frame, size):
+        self.photo = ImageTk.PhotoImage(frame)
+        self.allocations += 1
+        self.label.config(image=self.photo)
+
+
+def main():
+    default_folder = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                                  'sample_images')
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('folder', nargs='?', default=default_folder)
+    parser.add_argument('--transitions', type=int, default=2000)
+    parser.add_argument('--steps', type=int, default=12, help='frames per transition')
+    parser.add_argument('--size', default='800x600', help='window size as WIDTHxHEIGHT')
+    parser.add_argument('--style', choices=[s for s in TRANSITION_STYLES if s != 'none'],
+                        default='crossfade')
+    parser.add_argument('--allocate', action='store_true',
+                        help='allocate a PhotoImage per frame instead of reusing surfaces')
+    parser.add_argument('--max-growth-mb', type=float, default=16.0,
+                        help='fail if RSS grows more than this after warm-up')
+    args = parser.parse_args()
+
+    size = tuple(int(v) for v in args.size.lower().split('x'))
+    paths = list(iter_images([args.folder]))
+    if len(paths) < 2:
+        sys.exit(f"Need at least two images in {args.folder}")
+    frames = [render_image(path, size) for path in paths]
+
+    root = tk.Tk()
+    root.geometry(f"{size[0]}x{size[1]}")
+    label = tk.Label(root, borderwidth=0, padx=0, pady=0)
+    label.pack(fill=tk.BOTH, expand=True)
+    presenter = (AllocatingPresenter if args.allocate else FramePresenter)(label, '#000000')
+
+    print(f"{args.transitions} {args.style} transitions of {args.steps} frames at "
+          f"{size[0]}x{size[1]}, {'new PhotoImage per frame' if args.allocate else 'reused surfaces'}")
+    print(f"{'transitions':>11} {'RSS MB':>8} {'frames/s':>9}")
+    samples = []
+    pairs = itertools.cycle(zip(frames, frames[1:] + frames[:1]))
+    start = time.perf_counter()
+    for done in range(1, args.transitions + 1):
+        old, new = next(pairs)
+        transition = Transition(root, presenter, old, new, size, '#000000', style=args.style)
+        for step in range(args.steps):
+            presenter.show(transition.compose(step / (args.steps - 1)), size)
+        root.update()
+        if done % 100 == 0 or done == args.transitions:
+            rss = memory_usage()[0] / (1024 * 1024)
+            samples.append((done, rss))
+            rate = done * args.steps / (time.perf_counter() - start)
+            print(f"{done:>11} {rss:>8.1f} {rate:>9.0f}")
+    root.destroy()
+
+    baseline = next((rss for done, rss in samples if done >= args.transitions // 10), samples[0][1])
+    growth = samples[-1][1] - baseline
+    print(f"PhotoImage allocations: {presenter.allocations}")
+    print(f"RSS growth after warm-up: {growth:+.1f} MB (limit {args.max_growth_mb:.1f} MB)")
+    sys.exit(0 if growth <= args.max_growth_mb else 1)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,56 +1,2897 @@
+import time
 import tkinter as tk
-from tkinter import filedialog, Menu, messagebox
-from PIL import Image, ImageTk
+from tkinter import filedialog, simpledialog, Menu, messagebox
 import os
 import sys
 import json
+import csv
+import sqlite3
+import argparse
 import shutil
+import importlib
+import threading
+import hashlib
+import queue
+import fnmatch
+import bisect
+import heapq
+import random
+import math
+import struct
+from array import array
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+
+
+class StartupProfile:
+    """Record how long startup takes, from module import to the first frame on screen"""
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.marks = []  # (label, seconds since start)
+        self.imports = []  # (module, seconds spent importing)
+
+    def mark(self, label):
+        self.marks.append((label, time.perf_counter() - self.start))
+
+    def elapsed_ms(self, label):
+        """Return the time of a mark in milliseconds, or None if it has not happened"""
+        for name, seconds in self.marks:
+            if name == label:
+                return seconds * 1000
+        return None
+
+    def report(self):
+        """Return the recorded milestones and lazy import costs as text"""
+        lines = ["Startup timeline (ms since module import):"]
+        lines += [f"  {seconds * 1000:8.1f}  {label}" for label, seconds in self.marks]
+        if self.imports:
+            lines.append("Deferred imports (ms):")
+            lines += [f"  {seconds * 1000:8.1f}  {name}" for name, seconds in self.imports]
+        return "\n".join(lines)
+
+
+STARTUP = StartupProfile()
+
+
+class LazyModule:
+    """Stand-in for a module that is only imported when first used"""
+
+    def __init__(self, name, on_import=None):
+        self._name = name
+        self._module = None
+        self._on_import = on_import  # Called with the module once it is imported
+        self._lock = threading.Lock()
+
+    def __getattr__(self, attr):
+        if self._module is None:
+            with self._lock:
+                if self._module is None:
+                    start = time.perf_counter()
+                    module = importlib.import_module(self._name)
+                    if self._on_import:
+                        self._on_import(module)
+                    self._module = module
+                    STARTUP.imports.append((self._name, time.perf_counter() - start))
+        return getattr(self._module, attr)
+
+
+def configure_pillow(module):
+    """Replace Pillow's decompression-bomb check, which rejects anything over ~179 MP
+    outright, with open_image's configurable limit"""
+    module.MAX_IMAGE_PIXELS = None
+
+
+# Pillow is imported on first use so the window can appear before it loads
+Image = LazyModule('PIL.Image', on_import=configure_pillow)
+ImageTk = LazyModule('PIL.ImageTk')
+
+# Only remote sources need these, and http.client pulls in ssl and email
+http_client = LazyModule('http.client')
+url_parse = LazyModule('urllib.parse')
+
+
+def preload_imaging():
+    """Import Pillow ahead of the first decode; meant to run on a background thread"""
+    Image.open
+    ImageTk.PhotoImage
+
+# File extensions recognised as images
+VALID_EXTENSIONS = {'.jpg', '.jpeg', '.png', '.gif', '.bmp', '.tif', '.tiff', '.ppm', '.pgm'}
+
+# Formats whose extra frames are animation; the pages of a multi-page TIFF are not
+ANIMATED_FORMATS = {'GIF', 'PNG'}
+
+# Resampling filters selectable with the resample_quality setting, best quality first
+RESAMPLE_FILTERS = {
+    'lanczos': 'LANCZOS',
+    'bicubic': 'BICUBIC',
+    'bilinear': 'BILINEAR',
+}
+
+# EXIF orientation tag values and the transpose that displays the image upright
+EXIF_ORIENTATION_TAG = 0x0112
+EXIF_TRANSPOSE = {
+    2: 'FLIP_LEFT_RIGHT',
+    3: 'ROTATE_180',
+    4: 'FLIP_TOP_BOTTOM',
+    5: 'TRANSPOSE',
+    6: 'ROTATE_270',
+    7: 'TRANSVERSE',
+    8: 'ROTATE_90',
+}
+
+# Decoded frames buffered ahead of an animation's playback position
+ANIMATION_BUFFER_FRAMES = 8
+
+# Frame duration used when an animation specifies none, as browsers do
+DEFAULT_FRAME_DURATION = 100
+
+# Slide transition styles selectable from the menu
+TRANSITION_STYLES = ('none', 'crossfade', 'slide')
+
+# Slideshow ordering strategies selectable from the menu
+ORDER_STRATEGIES = ('sequential', 'shuffle', 'weighted', 'least_recent')
+
+# Seconds without further setting changes before the config file is written
+CONFIG_SAVE_DELAY = 1.0
+
+# Quiet period after the last resize event before the high-quality render
+RESIZE_SETTLE_MS = 150
+
+# Settings that apply to every window and are only read from the top level of the config
+SHARED_SETTINGS = ('frame_cache_mb', 'preview_cache_mb', 'resample_quality', 'decode_memory_mb',
+                   'max_image_megapixels', 'decode_workers', 'remote_connections', 'adaptive_quality',
+                   'render_budget_ms', 'max_load')
+
+# Tiers the quality governor steps through under load, best first: resample
+# filter, scale the image is decoded at before it is stretched to the window,
+# and a limit on the prefetch depth (None keeps the configured depth). The limit
+# never drops below 1, which would leave every decode to the Tk thread
+QUALITY_TIERS = (
+    ('lanczos', 1.0, None),
+    ('bicubic', 1.0, None),
+    ('bilinear', 1.0, 1),
+    ('bilinear', 0.75, 1),
+    ('bilinear', 0.5, 1),
+)
+
+# Image sources with these prefixes are HTTP manifests rather than local folders
+REMOTE_SCHEMES = ('http://', 'https://')
+
+# Image index entry packed into bytes: file size, mtime (ns), width, height,
+# format number (0 for an unreadable file), EXIF orientation and animated flag
+INDEX_ENTRY = struct.Struct('<QqIIBHB')
+
+# Long-edge sizes of the previews kept in the on-disk cache
+PREVIEW_SIZES = (640, 1280, 1920, 2560, 3840)
+
+# Default ceiling for the pixel memory of a single decode; larger images are
+# decoded at reduced scale or in strips, or skipped if neither is possible
+DECODE_MEMORY_LIMIT = 256 * 1024 * 1024
+
+# Sources with more pixels than this are refused from their header alone
+MAX_SOURCE_PIXELS = 1000 * 1000 * 1000
+
+# Bits per pixel of the raw layouts that can be decoded a strip at a time
+RAW_STRIP_BITS = {
+    '1': 1, 'L': 8, 'P': 8, 'LA': 16, 'I;16': 16, 'I;16B': 16, 'I;16L': 16,
+    'RGB': 24, 'BGR': 24, 'RGBA': 32, 'RGBX': 32, 'BGRA': 32, 'BGRX': 32, 'CMYK': 32,
+}
+
+
+class ImageTooLargeError(Exception):
+    """Raised for images that cannot be decoded within the configured limits"""
+
+
+class RemoteSourceError(OSError):
+    """Raised when a remote image source cannot be fetched and has no cached copy to fall back on"""
+
+
+def resample_filter(quality):
+    """Return the Pillow resampling filter for a resample_quality name"""
+    return getattr(Image.Resampling, RESAMPLE_FILTERS.get(quality, 'LANCZOS'))
+
+
+def fit_size(img_width, img_height, box_width, box_height):
+    """Return the largest size that fits inside the box while preserving aspect ratio"""
+    ratio = min(box_width/max(img_width, 1), box_height/max(img_height, 1))
+    return max(int(img_width * ratio), 1), max(int(img_height * ratio), 1)
+
+
+def open_image(image_path, max_pixels=MAX_SOURCE_PIXELS):
+    """Open an image without decoding it, refusing sources with more than max_pixels"""
+    img = Image.open(image_path)
+    if img.width * img.height > max_pixels:
+        img.close()
+        raise ImageTooLargeError(f"{img.width}x{img.height} is over the "
+                                 f"{max_pixels // 1000000} MP limit")
+    return img
+
+
+def decoded_bytes(img):
+    """Estimate the memory an image takes once decoded"""
+    # Pillow stores multi-band pixels in 32 bits
+    return img.width * img.height * (1 if img.mode in ('1', 'L', 'P') else 4)
+
+
+def decode_in_strips(img, new_size, resample, memory_limit):
+    """Scale an uncompressed image to new_size while decoding only a band of rows at a time
+
+    The pixels must be stored as full-width raw bands, as in BMP, PPM and TIFF
+    files saved without compression in one or more strips.
+    """
+    width, height = img.size
+    args = img.tile[0][3] if img.tile else None
+    if not img.tile or any(tile[0] != 'raw' or tile[3] != args or tile[1][0] != 0 or tile[1][2] != width
+                           for tile in img.tile):
+        raise ImageTooLargeError(f"{img.width}x{img.height} {img.format} needs "
+                                 f"{decoded_bytes(img) // (1024 * 1024)} MB to decode")
+    rawmode, stride, ystep = (args, 0, 1) if isinstance(args, str) else (tuple(args) + (0, 1))[:3]
+    if not stride:
+        if rawmode not in RAW_STRIP_BITS:
+            raise ImageTooLargeError(f"{img.width}x{img.height} {rawmode} data cannot be decoded in strips")
+        stride = (width * RAW_STRIP_BITS[rawmode] + 7) // 8
+    # (first row, end row, file offset) of each stored band, top to bottom
+    bands = sorted((tile[1][1], tile[1][3], tile[2]) for tile in img.tile)
+    if ystep < 0 and len(bands) > 1:
+        raise ImageTooLargeError(f"{img.width}x{img.height} {img.format} stores bottom-up strips")
+    
+    # Reduce each strip by a whole factor, leaving an image at least twice the
+    # target, like resize's reducing_gap; strips a multiple of the factor tall
+    # keep the reduced strips seamless
+    factor = max(int(min(width / new_size[0], height / new_size[1]) / 2), 1)
+    rows = max(memory_limit // 4 // max(stride, width * 4) // factor * factor, factor)
+    reduced = None
+    with open(img.filename, 'rb') as f:
+        for top in range(0, height, rows):
+            count = min(rows, height - top)
+            if ystep > 0:
+                # Gather the rows from every stored band the strip overlaps
+                chunks = []
+                for first, end, offset in bands:
+                    if first < top + count and end > top:
+                        f.seek(offset + (max(top, first) - first) * stride)
+                        chunks.append(f.read((min(top + count, end) - max(top, first)) * stride))
+                data = b''.join(chunks)
+            else:
+                # Bottom-up files (e.g. BMP) store the last row first
+                f.seek(bands[0][2] + (height - top - count) * stride)
+                data = f.read(count * stride)
+            if len(data) < count * stride:
+                raise OSError(f"{img.filename} is truncated")
+            strip = Image.frombuffer(img.mode, (width, count), data, 'raw', rawmode, stride, ystep)
+            # reduce() needs continuous tones
+            if img.mode == 'P':
+                strip.putpalette(img.getpalette())
+                strip = strip.convert('RGBA' if 'transparency' in img.info else 'RGB')
+            elif img.mode == '1':
+                strip = strip.convert('L')
+            strip = strip.reduce(factor)
+            if reduced is None:
+                reduced = Image.new(strip.mode, (strip.width, -(-height // factor)))
+            reduced.paste(strip, (0, top // factor))
+    return reduced.resize(new_size, resample)
+
+
+def render_image(image_path, size, quality='lanczos', timings=None,
+                 memory_limit=DECODE_MEMORY_LIMIT, max_pixels=MAX_SOURCE_PIXELS):
+    """Decode an image file and scale it to fit the given (width, height)
+
+    If a timings dict is given, decode_ms and resize_ms are added to it.
+    """
+    if timings is not None:
+        start = time.perf_counter()
+    with open_image(image_path, max_pixels) as img:
+        # Orientations 5-8 swap width and height once the image is turned upright
+        orientation = img.getexif().get(EXIF_ORIENTATION_TAG, 1)
+        box = (size[1], size[0]) if orientation in (5, 6, 7, 8) else size
+        new_size = fit_size(img.width, img.height, box[0], box[1])
+        
+        # Let the JPEG decoder skip detail we would throw away: it decodes at
+        # the smallest 1/2, 1/4 or 1/8 scale that still covers the target
+        if img.format == 'JPEG':
+            img.draft(img.mode, new_size)
+        
+        if decoded_bytes(img) > memory_limit:
+            # Too big to hold in memory even after draft(): decode a strip at a time
+            frame = decode_in_strips(img, new_size, resample_filter(quality), memory_limit)
+            if timings is not None:
+                decoded = time.perf_counter()
+                timings['decode_ms'] = timings.get('decode_ms', 0.0) + (decoded - start) * 1000
+                timings['strips'] = True
+        else:
+            # Decode up front when timing, as resize() would otherwise do it lazily
+            if timings is not None:
+                img.load()
+                decoded = time.perf_counter()
+                timings['decode_ms'] = timings.get('decode_ms', 0.0) + (decoded - start) * 1000
+            
+            # reducing_gap does a fast integer reduce() first, so the selected
+            # filter only runs over an image at most twice the target size
+            frame = img.resize(new_size, resample_filter(quality), reducing_gap=2.0)
+    
+    if orientation in EXIF_TRANSPOSE:
+        frame = frame.transpose(getattr(Image.Transpose, EXIF_TRANSPOSE[orientation]))
+    if timings is not None:
+        timings['resize_ms'] = timings.get('resize_ms', 0.0) + (time.perf_counter() - decoded) * 1000
+    return frame
+
+
+def read_image_header(image_path):
+    """Return (width, height, format, EXIF orientation, animated) from the file header without decoding pixels"""
+    with Image.open(image_path) as img:
+        return (img.width, img.height, img.format, img.getexif().get(EXIF_ORIENTATION_TAG, 1),
+                img.format in ANIMATED_FORMATS and bool(getattr(img, 'is_animated', False)))
+
+
+class FrameCache:
+    """Byte-bounded LRU cache of scaled frames keyed by (path, mtime, target size)"""
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.frames = OrderedDict()  # key -> (image, nbytes)
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def make_key(path, size):
+        """Build a cache key, or None if the file cannot be stat'ed"""
+        try:
+            mtime = os.stat(path).st_mtime_ns
+        except OSError:
+            return None
+        return (path, mtime) + tuple(size)
+
+    def get(self, path, size):
+        """Return the cached frame for path at size, or None on a miss"""
+        key = self.make_key(path, size)
+        with self.lock:
+            entry = self.frames.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self.frames.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, path, size, image, nbytes=None):
+        """Store a frame, evicting the least recently used ones to stay within budget"""
+        key = self.make_key(path, size)
+        if nbytes is None:
+            nbytes = decoded_bytes(image)
+        if key is None or nbytes > self.max_bytes:
+            return
+        with self.lock:
+            old = self.frames.pop(key, None)
+            if old is not None:
+                self.current_bytes -= old[1]
+            self.frames[key] = (image, nbytes)
+            self.current_bytes += nbytes
+            while self.current_bytes > self.max_bytes:
+                _, (_, evicted_bytes) = self.frames.popitem(last=False)
+                self.current_bytes -= evicted_bytes
+                self.evictions += 1
+
+    def clear(self):
+        """Drop all cached frames"""
+        with self.lock:
+            self.frames.clear()
+            self.current_bytes = 0
+
+    def stats(self):
+        """Return hit/miss/eviction counters and current usage"""
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'entries': len(self.frames),
+                'bytes': self.current_bytes,
+                'max_bytes': self.max_bytes,
+            }
+
+
+class PreviewCache:
+    """On-disk cache of downscaled previews at a few standard sizes, pruned LRU to a quota"""
+
+    def __init__(self, cache_dir, max_bytes):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.total_bytes = None  # Computed on first write
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def preview_size(size):
+        """Return the smallest standard preview size covering the target, or None if too large"""
+        for preview_size in PREVIEW_SIZES:
+            if preview_size >= max(size):
+                return preview_size
+        return None
+
+    def entry_path(self, image_path, preview_size):
+        """Return the cache path (without extension) for a source file, or None if it is missing"""
+        try:
+            stat = os.stat(image_path)
+        except OSError:
+            return None
+        # Size and mtime are part of the key so edited files get a fresh entry
+        key = f"{os.path.abspath(image_path)}|{stat.st_size}|{stat.st_mtime_ns}|{preview_size}"
+        return os.path.join(self.cache_dir, hashlib.sha1(key.encode('utf-8')).hexdigest())
+
+    def lookup(self, entry):
+        """Return the path of an existing preview for entry, or None"""
+        for ext in ('.jpg', '.png'):
+            path = entry + ext
+            if os.path.exists(path):
+                try:
+                    os.utime(path)  # Mark as recently used for pruning
+                except OSError:
+                    pass
+                return path
+        return None
+
+    def render(self, image_path, size, quality='lanczos', source_size=None, timings=None,
+               memory_limit=DECODE_MEMORY_LIMIT, max_pixels=MAX_SOURCE_PIXELS):
+        """Return the image scaled to size, reading from or filling in the preview cache"""
+        preview_size = self.preview_size(size)
+        entry = self.entry_path(image_path, preview_size) if preview_size else None
+        if entry is None:
+            return render_image(image_path, size, quality, timings, memory_limit, max_pixels)
+        
+        cached = self.lookup(entry)
+        if cached:
+            try:
+                frame = render_image(cached, size, quality, timings)
+                if timings is not None:
+                    timings['source'] = 'preview'
+                return frame
+            except Exception:
+                pass  # Damaged entry, rebuild it from the source
+        
+        if source_size is None:
+            with open_image(image_path, max_pixels) as img:
+                source_size = img.size
+        # Sources that are already small gain nothing from a preview
+        if max(source_size) <= preview_size:
+            return render_image(image_path, size, quality, timings, memory_limit, max_pixels)
+        
+        # Previews are always built at full quality since they are reused; for
+        # huge sources this also means the expensive decode happens only once
+        preview = render_image(image_path, (preview_size, preview_size), timings=timings,
+                               memory_limit=memory_limit, max_pixels=max_pixels)
+        self.store(entry, preview)
+        if timings is not None:
+            timings['source'] = 'preview built'
+            start = time.perf_counter()
+        new_size = fit_size(preview.width, preview.height, size[0], size[1])
+        frame = preview.resize(new_size, resample_filter(quality))
+        if timings is not None:
+            timings['resize_ms'] += (time.perf_counter() - start) * 1000
+        return frame
+
+    def warm(self, image_path, preview_size, memory_limit=DECODE_MEMORY_LIMIT,
+             max_pixels=MAX_SOURCE_PIXELS):
+        """Build the preview of one image ahead of time; returns (status, preview bytes)
+
+        status is 'cached' if a current preview exists, 'small' if the source
+        needs none, 'missing' if it is gone and 'built' otherwise.
+        """
+        entry = self.entry_path(image_path, preview_size)
+        if entry is None:
+            return 'missing', 0
+        if self.lookup(entry):
+            return 'cached', 0
+        with open_image(image_path, max_pixels) as img:
+            source_size = img.size
+        if max(source_size) <= preview_size:
+            return 'small', 0
+        preview = render_image(image_path, (preview_size, preview_size),
+                               memory_limit=memory_limit, max_pixels=max_pixels)
+        return 'built', self.store(entry, preview)
+
+    def store(self, entry, preview):
+        """Write a preview atomically, prune the cache if it exceeds its quota and return its size"""
+        has_alpha = preview.mode in ('RGBA', 'LA', 'P')
+        path = entry + ('.png' if has_alpha else '.jpg')
+        # Unique per process and thread, as the warm command writes from several processes
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            if has_alpha:
+                preview.save(tmp_path, 'PNG')
+            else:
+                preview.convert('RGB').save(tmp_path, 'JPEG', quality=90)
+            os.replace(tmp_path, path)
+            nbytes = os.path.getsize(path)
+        except OSError as e:
+            print(f"Error writing preview cache: {str(e)}")
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            return 0
+        
+        # No quota means the caller prunes, e.g. once after a batch warm-up
+        if self.max_bytes is None:
+            return nbytes
+        with self.lock:
+            if self.total_bytes is None:
+                self.total_bytes = sum(size for _, size, _ in self.scan())
+            else:
+                self.total_bytes += nbytes
+            if self.total_bytes > self.max_bytes:
+                self.prune()
+        return nbytes
+
+    def scan(self):
+        """Return (path, size, mtime) for every cached preview"""
+        entries = []
+        try:
+            for entry in os.scandir(self.cache_dir):
+                if entry.is_file() and not entry.name.endswith('.tmp'):
+                    stat = entry.stat()
+                    entries.append((entry.path, stat.st_size, stat.st_mtime))
+        except OSError:
+            pass
+        return entries
+
+    def prune(self):
+        """Delete least recently used previews until the cache is under 90% of its quota"""
+        entries = sorted(self.scan(), key=lambda e: e[2])
+        self.total_bytes = sum(size for _, size, _ in entries)
+        target = self.max_bytes * 0.9
+        for path, size, _ in entries:
+            if self.total_bytes <= target:
+                break
+            try:
+                os.remove(path)
+                self.total_bytes -= size
+            except OSError:
+                pass
+
+
+def matches_any(patterns, name, rel_path):
+    """Check a file or directory name, or its path relative to the root, against glob patterns"""
+    return any(fnmatch.fnmatch(name, pattern) or fnmatch.fnmatch(rel_path, pattern)
+               for pattern in patterns)
+
+
+def list_image_dir(directory, rel_dir, include=None, exclude=None):
+    """Return (image names, subdirectory names) for one directory, applying include/exclude globs"""
+    names = []
+    subdirs = []
+    with os.scandir(directory) as entries:
+        for entry in entries:
+            rel_path = f"{rel_dir}/{entry.name}" if rel_dir else entry.name
+            if exclude and matches_any(exclude, entry.name, rel_path):
+                continue
+            if entry.is_dir(follow_symlinks=False):
+                subdirs.append(entry.name)
+            elif (entry.is_file()
+                  and os.path.splitext(entry.name.lower())[1] in VALID_EXTENSIONS
+                  and (not include or matches_any(include, entry.name, rel_path))):
+                names.append(entry.name)
+    return names, subdirs
+
+
+def iter_images(roots, recursive=False, include=None, exclude=None):
+    """Lazily yield image paths under the given root folders, one directory at a time"""
+    for root in roots:
+        stack = [(os.path.normpath(root), '')]
+        while stack:
+            directory, rel_dir = stack.pop()
+            try:
+                names, subdirs = list_image_dir(directory, rel_dir, include, exclude)
+            except OSError:
+                continue
+            for name in names:
+                yield os.path.join(directory, name)
+            if recursive:
+                stack.extend((os.path.join(directory, sub), f"{rel_dir}/{sub}" if rel_dir else sub)
+                             for sub in reversed(subdirs))
+
+
+class Library:
+    """SQLite database holding settings, the image index and per-image statistics
+
+    Every change is written as an update of the affected rows, never as a
+    rewrite of the whole file. Settings are stored one row per key and
+    profile; the top level of the config has the profile ''.
+    """
+
+    VERSION = 2
+
+    # Statements that bring a database from the previous version to each version
+    MIGRATIONS = {
+        1: (
+            "CREATE TABLE settings (profile TEXT NOT NULL, key TEXT NOT NULL, value TEXT NOT NULL, "
+            "PRIMARY KEY (profile, key))",
+            "CREATE TABLE images (path TEXT PRIMARY KEY, size INTEGER, mtime INTEGER, width INTEGER, "
+            "height INTEGER, format TEXT, orientation INTEGER, animated INTEGER)",
+            "CREATE TABLE image_stats (path TEXT PRIMARY KEY, shown INTEGER NOT NULL, last_shown REAL)",
+        ),
+        2: (
+            "CREATE TABLE remote_files (url TEXT PRIMARY KEY, name TEXT NOT NULL, etag TEXT, "
+            "last_modified TEXT)",
+        ),
+    }
+
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.Lock()
+        self.written = {}  # (profile, key) -> JSON value as last stored
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        # WAL lets the reader at startup and the background writer work without blocking
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        self.created_from = self.migrate()
+
+    def migrate(self):
+        """Upgrade the schema to VERSION and return the version the file had before"""
+        with self.lock:
+            version = self.connection.execute("PRAGMA user_version").fetchone()[0]
+            if version > self.VERSION:
+                raise sqlite3.DatabaseError(
+                    f"{self.path} was written by a newer version (format {version})")
+            for target in range(version + 1, self.VERSION + 1):
+                self.connection.executescript(
+                    "BEGIN;\n" + ";\n".join(self.MIGRATIONS[target]) +
+                    f";\nPRAGMA user_version = {target};\nCOMMIT;")
+        return version
+
+    def import_json(self, config_file, index_file):
+        """Copy the settings and index of the JSON files used by older versions"""
+        try:
+            if os.path.exists(config_file):
+                with open(config_file, 'r') as f:
+                    self.write_settings(self.flatten(json.load(f)))
+            if os.path.exists(index_file):
+                with open(index_file, 'r') as f:
+                    data = json.load(f)
+                # Only the last JSON index format matches the table layout
+                if data.get('version') == 2:
+                    self.write_index(data.get('entries', {}), [])
+        except (OSError, ValueError) as e:
+            print(f"Error importing the old configuration: {str(e)}")
+
+    @staticmethod
+    def flatten(config):
+        """Turn a config dict with profiles into {(profile, key): JSON value}"""
+        rows = {('', key): json.dumps(value) for key, value in config.items() if key != 'profiles'}
+        for profile, settings in config.get('profiles', {}).items():
+            rows.update({(profile, key): json.dumps(value) for key, value in settings.items()})
+        return rows
+
+    def load_settings(self):
+        """Return the config dict, with extra windows under 'profiles'"""
+        with self.lock:
+            rows = self.connection.execute("SELECT profile, key, value FROM settings").fetchall()
+        config = {'profiles': {}}
+        self.written = {}
+        for profile, key, value in rows:
+            self.written[(profile, key)] = value
+            target = config if profile == '' else config['profiles'].setdefault(profile, {})
+            target[key] = json.loads(value)
+        return config
+
+    def write_settings(self, rows):
+        """Store flattened settings, touching only the rows that changed since the last write"""
+        changed = [(profile, key, value) for (profile, key), value in rows.items()
+                   if self.written.get((profile, key)) != value]
+        removed = [item for item in self.written if item not in rows]
+        if not changed and not removed:
+            return
+        with self.lock, self.connection:
+            self.connection.executemany(
+                "INSERT OR REPLACE INTO settings (profile, key, value) VALUES (?, ?, ?)", changed)
+            self.connection.executemany("DELETE FROM settings WHERE profile = ? AND key = ?", removed)
+        self.written = dict(rows)
+
+    def load_index(self):
+        """Return the image index rows as (path, size, mtime, width, height, format, orientation, animated)"""
+        with self.lock:
+            return self.connection.execute(
+                "SELECT path, size, mtime, width, height, format, orientation, animated FROM images"
+            ).fetchall()
+
+    def write_index(self, updated, removed):
+        """Insert or replace changed index entries and delete removed ones"""
+        with self.lock, self.connection:
+            self.connection.executemany(
+                "INSERT OR REPLACE INTO images VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                [[path] + list(entry) for path, entry in updated.items()])
+            self.connection.executemany("DELETE FROM images WHERE path = ?", [(path,) for path in removed])
+
+    def last_shown(self):
+        """Return path -> time of the last showing for every image shown so far"""
+        with self.lock:
+            return dict(self.connection.execute("SELECT path, last_shown FROM image_stats"))
+
+    def record_shows(self, shows):
+        """Count (path, timestamp) showings in the per-image statistics"""
+        with self.lock, self.connection:
+            self.connection.executemany(
+                "INSERT INTO image_stats (path, shown, last_shown) VALUES (?, 1, ?) "
+                "ON CONFLICT (path) DO UPDATE SET shown = shown + 1, last_shown = excluded.last_shown",
+                shows)
+
+    def load_remote(self):
+        """Return the remote file records as url -> (cached file name, ETag, Last-Modified)"""
+        with self.lock:
+            rows = self.connection.execute(
+                "SELECT url, name, etag, last_modified FROM remote_files").fetchall()
+        return {row[0]: tuple(row[1:]) for row in rows}
+
+    def write_remote(self, updated, removed):
+        """Insert or replace changed remote file records and delete those of dropped URLs"""
+        with self.lock, self.connection:
+            self.connection.executemany(
+                "INSERT OR REPLACE INTO remote_files VALUES (?, ?, ?, ?)",
+                [(url,) + tuple(record) for url, record in updated.items()])
+            self.connection.executemany("DELETE FROM remote_files WHERE url = ?",
+                                        [(url,) for url in removed])
+
+    def remote_names(self):
+        """Return the set of cached file names still referenced by any remote URL"""
+        with self.lock:
+            return {row[0] for row in self.connection.execute("SELECT DISTINCT name FROM remote_files")}
+
+    def close(self):
+        with self.lock:
+            self.connection.close()
+
+
+def open_library(config_dir):
+    """Open the settings database in config_dir, importing the JSON files of older versions the first time"""
+    library = Library(os.path.join(config_dir, "motivation_widget.db"))
+    if library.created_from == 0:
+        library.import_json(os.path.join(config_dir, "motivation_widget_config.json"),
+                            os.path.join(config_dir, "motivation_widget_index.json"))
+    return library
+
+
+class MetadataIndex:
+    """Persistent index of image headers used to skip unreadable files before they are shown"""
+
+    def __init__(self, library, workers=4):
+        self.library = library
+        self.workers = workers
+        # directory -> {name: INDEX_ENTRY bytes}; each directory is stored once and
+        # each file as a short name plus a fixed-size record
+        self.dirs = {}
+        self.formats = [None]  # Format names by number
+        self.format_ids = {}
+        self.changed = set()  # Paths added, updated or removed since the last save
+        self.lock = threading.Lock()
+        self.loaded = threading.Event()
+
+    def pack(self, size, mtime, header):
+        """Return the INDEX_ENTRY record for a file with header (width, height, format, orientation, animated)"""
+        width, height, image_format, orientation, animated = header
+        if image_format is None:
+            return INDEX_ENTRY.pack(size, mtime, 0, 0, 0, 0, 0)
+        format_id = self.format_ids.get(image_format)
+        if format_id is None:
+            format_id = self.format_ids[image_format] = len(self.formats)
+            self.formats.append(image_format)
+        if not isinstance(orientation, int) or not 0 <= orientation <= 0xFFFF:
+            orientation = 1  # Malformed EXIF
+        return INDEX_ENTRY.pack(size, mtime, width, height, format_id, orientation, bool(animated))
+
+    def lookup(self, path):
+        """Return (size, mtime, header) for an indexed path, header being None if unreadable, or None"""
+        directory, name = os.path.split(path)
+        record = self.dirs.get(directory, {}).get(name)
+        if record is None:
+            return None
+        size, mtime, width, height, format_id, orientation, animated = INDEX_ENTRY.unpack(record)
+        if not format_id:
+            return size, mtime, None
+        return size, mtime, (width, height, self.formats[format_id], orientation, bool(animated))
+
+    def load(self):
+        """Read the index saved by a previous session"""
+        try:
+            dirs = {}
+            for path, size, mtime, *header in self.library.load_index():
+                directory, name = os.path.split(path)
+                dirs.setdefault(directory, {})[name] = self.pack(size, mtime, header)
+            self.dirs = dirs
+        except sqlite3.Error as e:
+            print(f"Error loading image index: {str(e)}")
+        finally:
+            self.loaded.set()
+
+    def load_in_background(self):
+        """Read the saved index on a worker thread so the first frame does not wait for it"""
+        threading.Thread(target=self.load, name="index-loader", daemon=True).start()
+
+    def save(self):
+        """Write the entries that changed since the last save"""
+        with self.lock:
+            if not self.changed:
+                return
+            updated = {}
+            removed = []
+            for path in self.changed:
+                entry = self.lookup(path)
+                if entry is None:
+                    removed.append(path)
+                else:
+                    size, mtime, header = entry
+                    updated[path] = [size, mtime] + list(header or [None] * 5)
+            self.changed = set()
+        try:
+            self.library.write_index(updated, removed)
+        except sqlite3.Error as e:
+            print(f"Error saving image index: {str(e)}")
+
+    def get(self, path):
+        """Return (width, height, format, orientation, animated) for a valid indexed image, or None
+
+        Does not wait for the index to load; until then every path is unknown.
+        """
+        entry = self.lookup(path)
+        return None if entry is None else entry[2]
+
+    def current(self, path):
+        """Return the indexed header fields for path if the file is unchanged since, else None"""
+        self.loaded.wait()
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return None
+        entry = self.lookup(path)
+        if entry is not None and entry[0] == stat.st_size and entry[1] == stat.st_mtime_ns:
+            return entry[2] or (None,) * 5
+        return None
+
+    def check(self, path):
+        """Read the header of one file unless the indexed entry is still current"""
+        self.loaded.wait()
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return False
+        entry = self.lookup(path)
+        if entry is not None and entry[0] == stat.st_size and entry[1] == stat.st_mtime_ns:
+            return entry[2] is not None
+        try:
+            header = read_image_header(path)
+        except Exception:
+            header = (None,) * 5  # Corrupt or not really an image
+        directory, name = os.path.split(path)
+        with self.lock:
+            self.dirs.setdefault(directory, {})[name] = self.pack(stat.st_size, stat.st_mtime_ns, header)
+            self.changed.add(path)
+        return header[0] is not None
+
+    def validate(self, entries):
+        """Return the (directory, name) pairs whose headers are readable, checking them in parallel"""
+        self.loaded.wait()
+        paths = [os.path.join(directory, name) for directory, name in entries]
+        with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="header") as pool:
+            results = list(pool.map(self.check, paths))
+        return [entry for entry, valid in zip(entries, results) if valid]
+
+    def forget(self, entries):
+        """Drop index entries for files that no longer exist"""
+        self.loaded.wait()
+        with self.lock:
+            for directory, name in entries:
+                path = os.path.join(directory, name)
+                folder, file_name = os.path.split(path)
+                names = self.dirs.get(folder)
+                if names is not None and names.pop(file_name, None) is not None:
+                    self.changed.add(path)
+                    if not names:
+                        del self.dirs[folder]
+
+
+class AnimationPlayer:
+    """Play an animated image through a FramePresenter, decoding scaled frames on a worker thread into a bounded buffer"""
+
+    def __init__(self, root, presenter, image_path, size, quality='lanczos',
+                 max_bytes=64 * 1024 * 1024, cached_frames=None, on_cached=None):
+        self.root = root
+        self.presenter = presenter
+        self.image_path = image_path
+        self.size = size
+        self.quality = quality
+        self.max_bytes = max_bytes  # Whole animations up to this size are kept for replay
+        self.frames = cached_frames  # [(image, duration_ms)] once the full animation is in memory
+        self.on_cached = on_cached  # Called from the worker with the frame list when it fits
+        self.buffer = queue.Queue(maxsize=ANIMATION_BUFFER_FRAMES)
+        self.stop_event = threading.Event()
+        self.thread = None
+        self.index = 0
+        self.after_id = None
+        self.deadline = None
+        self.loop_ended = False
+        self.on_loop_end = None
+        self.failed = False  # Set by the worker when the animation cannot be decoded
+
+    @property
+    def playing(self):
+        return not self.stop_event.is_set()
+
+    def start(self):
+        if self.frames is None:
+            self.thread = threading.Thread(target=self.decode, name="animation", daemon=True)
+            self.thread.start()
+        self.deadline = time.perf_counter()
+        self.after_id = self.root.after(0, self.tick)
+
+    def stop(self):
+        self.stop_event.set()
+        if self.after_id:
+            self.root.after_cancel(self.after_id)
+            self.after_id = None
+
+    def finish_loop(self, callback):
+        """Call callback once the current loop ends; returns False if nothing is playing"""
+        if not self.playing:
+            return False
+        self.on_loop_end = callback
+        return True
+
+    def decode(self):
+        """Worker: decode and scale frames, looping until stopped or the whole animation is cached"""
+        resample = resample_filter(self.quality)
+        collected = []
+        collected_bytes = 0
+        try:
+            while not self.stop_event.is_set():
+                with open_image(self.image_path) as img:
+                    new_size = fit_size(img.width, img.height, self.size[0], self.size[1])
+                    frame_count = getattr(img, 'n_frames', 1)
+                    for index in range(frame_count):
+                        img.seek(index)
+                        duration = img.info.get('duration') or DEFAULT_FRAME_DURATION
+                        frame = img.convert('RGBA').resize(new_size, resample)
+                        
+                        # Keep the frames while the whole animation fits under the ceiling
+                        if collected is not None:
+                            collected.append((frame, duration))
+                            collected_bytes += new_size[0] * new_size[1] * 4
+                            if collected_bytes > self.max_bytes:
+                                collected = None
+                        
+                        if not self.put((frame, duration, index == frame_count - 1)):
+                            return
+                
+                if collected is not None:
+                    # Playback switches to the in-memory copy once the buffer drains
+                    self.frames = collected
+                    if self.on_cached:
+                        self.on_cached(collected, collected_bytes)
+                    return
+        except Exception as e:
+            print(f"Error decoding animation: {str(e)}")
+            # Leave the poster frame up and let the slideshow move on normally
+            self.failed = True
+            self.stop_event.set()
+
+    def put(self, item):
+        """Wait for room in the buffer, giving up if playback stops"""
+        while not self.stop_event.is_set():
+            try:
+                self.buffer.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def next_frame(self):
+        """Return (image, duration, last_in_loop) or None if the decoder has not caught up"""
+        try:
+            return self.buffer.get_nowait()
+        except queue.Empty:
+            pass
+        if self.frames is None:
+            return None
+        frame, duration = self.frames[self.index]
+        self.index = (self.index + 1) % len(self.frames)
+        return frame, duration, self.index == 0
+
+    def tick(self):
+        self.after_id = None
+        if self.stop_event.is_set():
+            # A failed decode ends the loop early; pass on a slide change waiting for it
+            if self.failed and self.on_loop_end:
+                callback, self.on_loop_end = self.on_loop_end, None
+                callback()
+            return
+        if self.loop_ended and self.on_loop_end:
+            callback = self.on_loop_end
+            self.stop()
+            callback()
+            return
+        
+        item = self.next_frame()
+        if item is None:
+            # Decoder is behind; check again shortly rather than skipping frames
+            self.deadline = time.perf_counter()
+            self.after_id = self.root.after(10, self.tick)
+            return
+        
+        frame, duration, self.loop_ended = item
+        self.presenter.show(frame, self.size)
+        
+        # Schedule against an absolute deadline so timer jitter does not accumulate;
+        # if we fell more than a frame behind, resynchronise instead of bursting
+        now = time.perf_counter()
+        self.deadline = max(self.deadline + duration / 1000, now)
+        self.after_id = self.root.after(int((self.deadline - now) * 1000), self.tick)
+
+
+def compose_canvas(frame, size, background, canvas=None):
+    """Center a frame on a background-filled canvas of the given size, reusing canvas if given"""
+    if canvas is None:
+        canvas = Image.new('RGB', size, background)
+    else:
+        canvas.paste(background, (0, 0) + tuple(size))
+    offset = ((size[0] - frame.width) // 2, (size[1] - frame.height) // 2)
+    if frame.mode in ('RGBA', 'LA', 'P'):
+        frame = frame.convert('RGBA')
+        canvas.paste(frame, offset, frame)
+    else:
+        canvas.paste(frame.convert('RGB'), offset)
+    return canvas
+
+
+class FramePresenter:
+    """Show frames in a label through two PhotoImage surfaces that are reused while the size stays the same
+
+    Each frame is centered on a window-sized canvas and pasted into the
+    surface that is not on screen, which then replaces the visible one. Tk
+    images are only allocated when the window size changes.
+    """
+
+    def __init__(self, label, background='#FFFFFF'):
+        self.label = label
+        self.background = background
+        self.surfaces = [None, None]  # PhotoImages, each allocated on first use at a size
+        self.canvas = None  # Reused RGB staging image at the surface size
+        self.front = 0  # Index of the surface on screen
+        self.allocations = 0
+
+    def show(self, frame, size):
+        """Display a frame centered in a surface of the given (width, height)"""
+        size = tuple(size)
+        back = 1 - self.front
+        surface = self.surfaces[back]
+        if surface is None or (surface.width(), surface.height()) != size:
+            surface = self.surfaces[back] = ImageTk.PhotoImage('RGB', size)
+            self.allocations += 1
+        if frame.size == size and frame.mode == 'RGB':
+            canvas = frame  # Already a full canvas, e.g. a transition step
+        else:
+            if self.canvas is None or self.canvas.size != size:
+                self.canvas = Image.new('RGB', size)
+            canvas = compose_canvas(frame, size, self.background, self.canvas)
+        surface.paste(canvas)
+        self.label.config(image=surface)
+        self.front = back
+
+
+class Transition:
+    """Animate between two frames through a FramePresenter at a target frame rate, dropping frames rather than stalling"""
+
+    def __init__(self, root, presenter, old_frame, new_frame, size, background,
+                 style='crossfade', duration_ms=600, fps=30, on_done=None):
+        self.root = root
+        self.presenter = presenter
+        self.size = size
+        self.style = style
+        self.duration = duration_ms / 1000
+        self.fps = fps
+        self.on_done = on_done
+        # Both frames are pre-scaled, so only blending/pasting happens per step
+        self.old_canvas = compose_canvas(old_frame, size, background)
+        self.new_canvas = compose_canvas(new_frame, size, background)
+        self.after_id = None
+        self.start_time = None
+        self.last_slot = -1
+        self.dropped = 0
+        self.frame_times = []
+
+    def start(self):
+        self.start_time = time.perf_counter()
+        self.tick()
+
+    def cancel(self):
+        if self.after_id:
+            self.root.after_cancel(self.after_id)
+            self.after_id = None
+
+    def finish(self):
+        """Skip to the end: stop ticking and run on_done now"""
+        self.cancel()
+        if self.on_done:
+            self.on_done()
+
+    def compose(self, progress):
+        """Return the intermediate frame for progress in [0, 1]"""
+        if self.style == 'slide':
+            eased = progress * progress * (3 - 2 * progress)
+            offset = int(self.size[0] * eased)
+            frame = Image.new('RGB', self.size)
+            frame.paste(self.old_canvas, (-offset, 0))
+            frame.paste(self.new_canvas, (self.size[0] - offset, 0))
+            return frame
+        return Image.blend(self.old_canvas, self.new_canvas, progress)
+
+    def tick(self):
+        self.after_id = None
+        tick_start = time.perf_counter()
+        elapsed = tick_start - self.start_time
+        if elapsed >= self.duration:
+            if self.on_done:
+                self.on_done()
+            return
+        
+        # Progress follows the clock, so a late tick skips ahead instead of slowing down
+        slot = int(elapsed * self.fps)
+        self.dropped += max(slot - self.last_slot - 1, 0)
+        self.last_slot = slot
+        
+        self.presenter.show(self.compose(elapsed / self.duration), self.size)
+        self.frame_times.append((time.perf_counter() - tick_start) * 1000)
+        
+        # Return to the event loop until the next frame slot
+        next_slot_time = self.start_time + (slot + 1) / self.fps
+        delay_ms = max(int((next_slot_time - time.perf_counter()) * 1000), 0)
+        self.after_id = self.root.after(delay_ms, self.tick)
+
+    def stats(self):
+        """Return frame counts and per-frame render times in milliseconds"""
+        shown = len(self.frame_times)
+        return {
+            'style': self.style,
+            'frames': shown,
+            'dropped': self.dropped,
+            'target_frames': shown + self.dropped,
+            'mean_ms': sum(self.frame_times) / shown if shown else 0.0,
+            'max_ms': max(self.frame_times, default=0.0),
+        }
+
+
+class ImageList:
+    """Compact list of image paths that stores each directory once and each file as a name plus a directory number"""
+
+    def __init__(self):
+        self.dirs = []
+        self.dir_ids = {}
+        self.dir_of = array('I')
+        self.names = []
+
+    def __len__(self):
+        return len(self.names)
+
+    def __getitem__(self, index):
+        return os.path.join(self.dirs[self.dir_of[index]], self.names[index])
+
+    def __iter__(self):
+        for index in range(len(self.names)):
+            yield self[index]
+
+    def extend(self, entries):
+        """Append (directory, name) pairs"""
+        for directory, name in entries:
+            dir_id = self.dir_ids.get(directory)
+            if dir_id is None:
+                dir_id = self.dir_ids[directory] = len(self.dirs)
+                self.dirs.append(directory)
+            self.dir_of.append(dir_id)
+            self.names.append(name)
+
+    def remove(self, entries):
+        """Remove (directory, name) pairs and return the positions they occupied, in order"""
+        removed = {(self.dir_ids[d], n) for d, n in entries if d in self.dir_ids}
+        positions = []
+        dir_of = array('I')
+        names = []
+        for index, (dir_id, name) in enumerate(zip(self.dir_of, self.names)):
+            if (dir_id, name) in removed:
+                positions.append(index)
+            else:
+                dir_of.append(dir_id)
+                names.append(name)
+        self.dir_of = dir_of
+        self.names = names
+        return positions
+
+
+def remap_positions(indices, removed):
+    """Map indices after the given sorted positions were removed, dropping removed ones"""
+    result = array('I')
+    for index in indices:
+        shift = bisect.bisect_left(removed, index)
+        if shift < len(removed) and removed[shift] == index:
+            continue
+        result.append(index - shift)
+    return result
+
+
+class Sequencer:
+    """Choose the next slide; the base class walks the images in order"""
+
+    def __init__(self, count=0):
+        self.count = count
+
+    def first(self):
+        """Return the index a new slideshow starts with"""
+        return 0
+
+    def next(self, current):
+        """Return the index to show after current"""
+        return (current + 1) % self.count
+
+    def upcoming(self, current, limit):
+        """Return up to limit indices that will follow current, in order"""
+        return [(current + offset) % self.count for offset in range(1, min(limit, self.count - 1) + 1)]
+
+    def extend(self, weights):
+        """Account for images appended to the list, one weight per image"""
+        self.count += len(weights)
+
+    def remove(self, positions):
+        """Account for images removed from the given sorted positions"""
+        self.count -= len(positions)
+
+
+class ShuffleSequencer(Sequencer):
+    """Show every image once in random order before any repeats, using a lazy Fisher-Yates deck"""
+
+    def __init__(self, count=0):
+        super().__init__(count)
+        self.deck = array('I', range(count))
+        self.position = 0  # Next deck slot to show
+        self.drawn = 0  # Deck slots before this are already fixed
+        self.last = None
+
+    def draw(self, slot):
+        """Fix the image in a deck slot by swapping in a random undrawn one"""
+        other = random.randrange(slot, self.count)
+        self.deck[slot], self.deck[other] = self.deck[other], self.deck[slot]
+        # Avoid showing the same image twice across a deck boundary
+        if slot == 0 and self.deck[0] == self.last and self.count > 1:
+            other = random.randrange(1, self.count)
+            self.deck[0], self.deck[other] = self.deck[other], self.deck[0]
+        self.drawn = slot + 1
+
+    def first(self):
+        return self.next(None)
+
+    def next(self, current):
+        if self.position >= self.count:
+            # Deck exhausted: start a new one, reshuffled lazily as it is drawn
+            self.position = 0
+            self.drawn = 0
+        if self.position >= self.drawn:
+            self.draw(self.position)
+        self.last = self.deck[self.position]
+        self.position += 1
+        return self.last
+
+    def upcoming(self, current, limit):
+        if self.position >= self.count:
+            self.position = 0
+            self.drawn = 0
+        result = []
+        for slot in range(self.position, min(self.position + limit, self.count)):
+            if slot >= self.drawn:
+                self.draw(slot)
+            result.append(self.deck[slot])
+        return result
+
+    def extend(self, weights):
+        # New images join the undrawn part of the current deck
+        self.deck.extend(range(self.count, self.count + len(weights)))
+        self.count += len(weights)
+
+    def remove(self, positions):
+        shown = remap_positions(self.deck[:self.position], positions)
+        drawn = remap_positions(self.deck[self.position:self.drawn], positions)
+        rest = remap_positions(self.deck[self.drawn:], positions)
+        self.deck = shown + drawn + rest
+        self.position = len(shown)
+        self.drawn = len(shown) + len(drawn)
+        self.count = len(self.deck)
+
+
+class WeightedSequencer(Sequencer):
+    """Pick images at random in proportion to their weight, sampling a Fenwick tree in O(log n)"""
+
+    def __init__(self, weights=()):
+        super().__init__(0)
+        self.weights = array('d')
+        self.tree = array('d', [0.0])  # 1-based Fenwick tree of weights
+        self.total = 0.0
+        self.lookahead = deque()
+        self.extend(weights)
+
+    def extend(self, weights):
+        for weight in weights:
+            weight = max(float(weight), 0.0)
+            self.weights.append(weight)
+            self.count += 1
+            # A new node covers the lowbit-sized range ending at it
+            node = self.count
+            low = node - (node & -node)
+            self.tree.append(weight + self.prefix(node - 1) - self.prefix(low))
+            self.total += weight
+
+    def prefix(self, node):
+        """Return the sum of the first node weights"""
+        total = 0.0
+        while node > 0:
+            total += self.tree[node]
+            node -= node & -node
+        return total
+
+    def sample(self):
+        """Return a random index chosen in proportion to weight"""
+        if self.total <= 0:
+            return random.randrange(self.count)
+        target = random.random() * self.total
+        node = 0
+        step = 1 << self.count.bit_length()
+        while step:
+            child = node + step
+            if child <= self.count and self.tree[child] <= target:
+                node = child
+                target -= self.tree[child]
+            step >>= 1
+        return min(node, self.count - 1)
+
+    def pick(self, previous):
+        """Sample an index, retrying a few times to avoid showing previous twice in a row"""
+        index = self.sample()
+        for _ in range(8):
+            if index != previous or self.count < 2:
+                break
+            index = self.sample()
+        return index
+
+    def first(self):
+        return self.pick(None)
+
+    def next(self, current):
+        if self.lookahead:
+            return self.lookahead.popleft()
+        return self.pick(current)
+
+    def upcoming(self, current, limit):
+        previous = self.lookahead[-1] if self.lookahead else current
+        while len(self.lookahead) < min(limit, self.count - 1):
+            previous = self.pick(previous)
+            self.lookahead.append(previous)
+        return list(self.lookahead)[:limit]
+
+    def remove(self, positions):
+        removed = set(positions)
+        weights = [w for index, w in enumerate(self.weights) if index not in removed]
+        lookahead = remap_positions(self.lookahead, positions)
+        self.__init__(weights)
+        self.lookahead.extend(lookahead)
+
+
+def heap_smallest(heap, limit):
+    """Return the limit smallest items of a heap in order, visiting only the top of the tree"""
+    result = []
+    frontier = [(heap[0], 0)] if heap else []
+    while frontier and len(result) < limit:
+        item, node = heapq.heappop(frontier)
+        result.append(item)
+        for child in (2 * node + 1, 2 * node + 2):
+            if child < len(heap):
+                heapq.heappush(frontier, (heap[child], child))
+    return result
+
+
+class LeastRecentSequencer(Sequencer):
+    """Always show the image that was shown least recently, across sessions
+
+    extend() takes the time each image was last shown (0 for never) instead
+    of a weight. Images not yet shown in this session wait in a heap ordered
+    by that time; once shown they move to a queue behind it, since anything
+    shown now is more recent than every stored time.
+    """
+
+    def __init__(self, count=0):
+        super().__init__(count)
+        self.heap = [(0.0, index) for index in range(count)]  # (last shown, index) not shown this session
+        self.shown = deque()  # Indices shown this session, least recent first
+
+    def first(self):
+        return self.next(None)
+
+    def next(self, current):
+        # The image on screen counts as shown, so it is never picked again straight away
+        while self.heap:
+            index = heapq.heappop(self.heap)[1]
+            self.shown.append(index)
+            if index != current:
+                return index
+        index = self.shown.popleft()
+        self.shown.append(index)
+        if index == current and self.count > 1:
+            index = self.shown.popleft()
+            self.shown.append(index)
+        return index
+
+    def upcoming(self, current, limit):
+        limit = min(limit, self.count - 1)
+        result = [index for _, index in heap_smallest(self.heap, limit + 1) if index != current]
+        for index in self.shown:
+            if len(result) >= limit:
+                break
+            if index != current:
+                result.append(index)
+        return result[:limit]
+
+    def extend(self, weights):
+        for offset, shown_at in enumerate(weights):
+            heapq.heappush(self.heap, (shown_at, self.count + offset))
+        self.count += len(weights)
+
+    def remove(self, positions):
+        heap = []
+        for shown_at, index in self.heap:
+            shift = bisect.bisect_left(positions, index)
+            if shift < len(positions) and positions[shift] == index:
+                continue
+            heap.append((shown_at, index - shift))
+        heapq.heapify(heap)
+        self.heap = heap
+        self.shown = deque(remap_positions(self.shown, positions))
+        self.count = len(self.heap) + len(self.shown)
+
+
+def make_sequencer(order):
+    """Create an empty sequencer for an ordering strategy name"""
+    if order == 'shuffle':
+        return ShuffleSequencer()
+    if order == 'weighted':
+        return WeightedSequencer()
+    if order == 'least_recent':
+        return LeastRecentSequencer()
+    return Sequencer()
+
+
+def is_remote(source):
+    """Check whether an image source is an HTTP manifest URL rather than a folder"""
+    return source.lower().startswith(REMOTE_SCHEMES)
+
+
+class ConnectionPool:
+    """Keep-alive HTTP connections shared by all remote sources, with a bound on requests in flight"""
+
+    def __init__(self, max_connections=4, timeout=30.0):
+        self.max_connections = max_connections
+        self.timeout = timeout
+        self.slots = threading.BoundedSemaphore(max_connections)
+        self.idle = {}  # (scheme, host, port) -> connections waiting to be reused
+        self.lock = threading.Lock()
+        self.opened = 0  # Connections created, against requests made, shows how well they are reused
+        self.requests = 0
+
+    def checkout(self, key, reuse=True):
+        """Return an idle connection to the server, or a new one"""
+        with self.lock:
+            self.requests += 1
+            idle = self.idle.get(key)
+            if reuse and idle:
+                return idle.pop(), True
+            self.opened += 1
+        scheme, host, port = key
+        connection_class = http_client.HTTPSConnection if scheme == 'https' else http_client.HTTPConnection
+        return connection_class(host, port, timeout=self.timeout), False
+
+    def get(self, url, headers=None, write=None):
+        """GET url, passing the body of a 200 response to write in chunks; returns (status, headers)
+
+        Blocks while max_connections requests are already in flight. A request
+        on a reused connection that the server has closed meanwhile is retried
+        once on a new connection.
+        """
+        parts = url_parse.urlsplit(url)
+        if parts.scheme not in ('http', 'https') or not parts.hostname:
+            raise RemoteSourceError(f"Unsupported URL: {url}")
+        key = (parts.scheme, parts.hostname, parts.port)
+        target = url_parse.urlunsplit(('', '', parts.path or '/', parts.query, ''))
+        with self.slots:
+            for attempt in range(2):
+                connection, reused = self.checkout(key, reuse=attempt == 0)
+                written = False
+                try:
+                    connection.request('GET', target, headers=headers or {})
+                    response = connection.getresponse()
+                    # Always read the whole body so the connection can carry the next request
+                    while True:
+                        chunk = response.read(64 * 1024)
+                        if not chunk:
+                            break
+                        if write is not None and response.status == 200:
+                            written = True
+                            write(chunk)
+                except (OSError, http_client.HTTPException):
+                    connection.close()
+                    if reused and not written:
+                        continue
+                    raise
+                if response.will_close:
+                    connection.close()
+                else:
+                    with self.lock:
+                        self.idle.setdefault(key, []).append(connection)
+                return response.status, response.headers
+
+    def close(self):
+        """Close every idle connection"""
+        with self.lock:
+            idle, self.idle = self.idle, {}
+        for connections in idle.values():
+            for connection in connections:
+                connection.close()
+
+
+class RemoteMirror:
+    """Keep a local content-addressed copy of the images listed in an HTTP manifest
+
+    The manifest is a JSON list of image URLs, or an object with an "images"
+    list, resolved relative to the manifest's own URL. Every download is
+    stored under the SHA-256 of its content, so a changed image gets a new
+    local path and identical images are stored once. Cached copies are
+    revalidated with If-None-Match and If-Modified-Since instead of being
+    downloaded again, and the last manifest fetched is used while the server
+    cannot be reached. All of this runs on the folder watcher's thread and
+    the download threads, never on the Tk thread.
+    """
+
+    def __init__(self, url, cache_dir, library, pool, include=None, exclude=None):
+        self.url = url
+        self.cache_dir = cache_dir
+        self.library = library
+        self.pool = pool
+        self.include = include
+        self.exclude = exclude
+        self.records = None  # url -> (cached file name, ETag, Last-Modified), loaded on the first sync
+        self.updated = set()  # URLs whose records changed since they were last written
+        self.listed = {}  # Image URL -> cached file name for the manifest in use
+        self.manifest_name = None  # Cached file name of that manifest
+        self.lock = threading.Lock()
+        self.downloads = 0
+        self.revalidated = 0  # Requests answered with 304 Not Modified
+
+    def fetch(self, url):
+        """Bring the cached copy of url up to date and return (cached file name, whether it changed)"""
+        with self.lock:
+            record = self.records.get(url)
+        headers = {}
+        if record and os.path.exists(os.path.join(self.cache_dir, record[0])):
+            if record[1]:
+                headers['If-None-Match'] = record[1]
+            if record[2]:
+                headers['If-Modified-Since'] = record[2]
+        
+        # Stream the body to a temporary file, hashing it on the way
+        digest = hashlib.sha256()
+        part = os.path.join(self.cache_dir, f".{os.getpid()}-{threading.get_ident()}.part")
+        with open(part, 'wb') as f:
+            def write(chunk):
+                digest.update(chunk)
+                f.write(chunk)
+            try:
+                status, response_headers = self.pool.get(url, headers, write)
+            except BaseException:
+                f.close()
+                os.remove(part)
+                raise
+        if status == 304 and headers:
+            os.remove(part)
+            with self.lock:
+                self.revalidated += 1
+            return record[0], False
+        if status != 200:
+            os.remove(part)
+            raise RemoteSourceError(f"HTTP {status} for {url}")
+        
+        name = digest.hexdigest() + os.path.splitext(url_parse.urlsplit(url).path)[1].lower()
+        target = os.path.join(self.cache_dir, name)
+        if os.path.exists(target):
+            os.remove(part)  # Same content as a file already cached
+        else:
+            os.replace(part, target)
+        with self.lock:
+            self.records[url] = (name, response_headers.get('ETag'), response_headers.get('Last-Modified'))
+            self.updated.add(url)
+            self.downloads += 1
+        return name, record is None or record[0] != name
+
+    def parse(self, name):
+        """Return the image URLs of a cached manifest, in order, filtered like folder contents"""
+        try:
+            with open(os.path.join(self.cache_dir, name), 'rb') as f:
+                data = json.load(f)
+        except ValueError as e:
+            raise RemoteSourceError(f"Invalid manifest {self.url}: {str(e)}")
+        if isinstance(data, dict):
+            data = data.get('images', [])
+        urls = []
+        seen = set()
+        for item in data if isinstance(data, list) else []:
+            if not isinstance(item, str):
+                continue
+            url = url_parse.urljoin(self.url, item)
+            rel_path = url_parse.unquote(url_parse.urlsplit(item).path).lstrip('/')
+            file_name = rel_path.rsplit('/', 1)[-1]
+            if os.path.splitext(file_name.lower())[1] not in VALID_EXTENSIONS or url in seen:
+                continue
+            if self.exclude and matches_any(self.exclude, file_name, rel_path):
+                continue
+            if self.include and not matches_any(self.include, file_name, rel_path):
+                continue
+            seen.add(url)
+            urls.append(url)
+        return urls
+
+    def cached(self, name):
+        return os.path.exists(os.path.join(self.cache_dir, name))
+
+    def sync(self, full, batch_size=200):
+        """Refresh the manifest and its images, yielding (added, removed) lists of (directory, name) pairs
+
+        On the first call the images cached by a previous session are reported
+        before anything is fetched. Later images are reported in manifest
+        order as they arrive, the first one on its own so the slideshow can
+        start. Unless full is set, images are only revalidated when the
+        manifest itself has changed.
+        """
+        if self.records is None:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            self.records = self.library.load_remote()
+            record = self.records.get(self.url)
+            if record and self.cached(record[0]):
+                self.manifest_name = record[0]
+                self.listed = {url: self.records[url][0] for url in self.parse(record[0])
+                               if url in self.records and self.cached(self.records[url][0])}
+                names = list(dict.fromkeys(self.listed.values()))
+                if names:
+                    yield [(self.cache_dir, name) for name in names], []
+        
+        try:
+            manifest_name, changed = self.fetch(self.url)
+        except (OSError, http_client.HTTPException) as e:
+            if self.manifest_name is None:
+                raise RemoteSourceError(f"Cannot load {self.url}: {str(e)}")
+            print(f"Error refreshing {self.url}, showing the cached images: {str(e)}")
+            return
+        if not changed and not full and manifest_name == self.manifest_name:
+            return
+        urls = self.parse(manifest_name)
+        
+        # Revalidate or download the images with as many requests in flight as the pool allows
+        reported = set(self.listed.values())
+        listed = {}
+        batch = []
+        with ThreadPoolExecutor(max_workers=self.pool.max_connections,
+                                thread_name_prefix="download") as workers:
+            futures = [(url, workers.submit(self.fetch, url)) for url in urls]
+            for url, future in futures:
+                try:
+                    listed[url] = future.result()[0]
+                except (OSError, http_client.HTTPException) as e:
+                    print(f"Error downloading {url}: {str(e)}")
+                    # Keep showing the copy we have, if any
+                    if url in self.listed and self.cached(self.listed[url]):
+                        listed[url] = self.listed[url]
+                    continue
+                if listed[url] not in reported:
+                    reported.add(listed[url])
+                    batch.append((self.cache_dir, listed[url]))
+                    if len(batch) >= batch_size or len(reported) == 1:
+                        yield batch, []
+                        batch = []
+        
+        # Forget images dropped from the manifest and delete files no URL refers to any more
+        dropped = [url for url in self.listed if url not in listed]
+        kept = set(listed.values())
+        stale = (set(self.listed.values()) | {self.manifest_name}) - kept - {manifest_name, None}
+        with self.lock:
+            for url in dropped:
+                self.records.pop(url, None)
+            updated = {url: self.records[url] for url in self.updated if url in self.records}
+            self.updated = set()
+        self.library.write_remote(updated, dropped)
+        referenced = self.library.remote_names()
+        for name in stale - referenced:
+            try:
+                os.remove(os.path.join(self.cache_dir, name))
+            except OSError:
+                pass
+        
+        removed = [(self.cache_dir, name) for name in set(self.listed.values()) - kept]
+        self.listed = listed
+        self.manifest_name = manifest_name
+        if batch or removed:
+            yield batch, removed
+
+
+class FolderWatcher:
+    """Index folders on a background thread and report images as they are added or removed"""
+
+    def __init__(self, roots, recursive=False, include=None, exclude=None,
+                 interval=5.0, batch_size=200, full_rescan_every=12, validate=None, open_remote=None,
+                 first_batch_size=16, on_scanned=None):
+        self.validate = validate  # Optional filter applied to new images before they are reported
+        self.on_scanned = on_scanned  # Called on the watcher thread after a scan that found changes
+        self.roots = [root if is_remote(root) else os.path.normpath(root) for root in roots]
+        # Manifest URLs are mirrored into a local cache whose files are reported like folder contents
+        self.remotes = {root: open_remote(root, include, exclude)
+                        for root in self.roots if is_remote(root) and open_remote}
+        self.recursive = recursive
+        self.include = include
+        self.exclude = exclude
+        self.interval = interval
+        self.batch_size = batch_size
+        self.first_batch_size = first_batch_size  # Until the first images are out, validate only this many
+        self.reported_any = False
+        # Some network shares do not update directory mtimes, so rescan regardless now and then
+        self.full_rescan_every = full_rescan_every
+        self.changes = queue.Queue()  # (added, removed, scan_complete, error) with (dir, name) pairs
+        self.dirs = {}  # directory -> (mtime, image names, subdirectory names)
+        # (dir, name) -> (size, mtime) of listed images that failed validation, e.g. while
+        # still being copied; they are offered again once they change
+        self.rejected = {}
+        self.scanned = False
+        self.stop_event = threading.Event()
+        self.active = threading.Event()  # Cleared while the widget is hidden
+        self.active.set()
+        self.thread = threading.Thread(target=self.run, name="folder-watcher", daemon=True)
+
+    def start(self):
+        self.thread.start()
+
+    def stop(self):
+        self.stop_event.set()
+        self.active.set()
+
+    def pause(self):
+        self.active.clear()
+
+    def resume(self):
+        self.active.set()
+
+    def poll(self, full):
+        """Walk the roots, relisting only directories whose mtime changed, and report differences"""
+        added = []
+        removed = []
+        seen = set()
+        reported = False
+        for root in self.roots:
+            if is_remote(root):
+                if root in self.remotes:
+                    self.sync_remote(self.remotes[root], full)
+                continue
+            stack = [(root, '')]
+            while stack:
+                if self.stop_event.is_set():
+                    return
+                directory, rel_dir = stack.pop()
+                try:
+                    mtime = os.stat(directory).st_mtime_ns
+                except OSError:
+                    continue  # Vanished directories are handled below
+                seen.add(directory)
+                
+                # Adding or deleting a file updates the directory mtime, which is cheap to poll
+                old = self.dirs.get(directory)
+                if full or old is None or old[0] != mtime:
+                    names, subdirs = list_image_dir(directory, rel_dir, self.include, self.exclude)
+                    old_names = set(old[1]) if old else set()
+                    new_names = set(names)
+                    added.extend((directory, name) for name in names if name not in old_names)
+                    removed.extend((directory, name) for name in old_names if name not in new_names)
+                    self.dirs[directory] = (mtime, tuple(names), tuple(subdirs))
+                else:
+                    subdirs = old[2]
+                
+                if self.recursive:
+                    stack.extend((os.path.join(directory, sub), f"{rel_dir}/{sub}" if rel_dir else sub)
+                                 for sub in reversed(subdirs))
+                
+                # Hand over the first images immediately and the rest in batches
+                if len(added) >= self.batch_size or (added and not reported):
+                    self.report(added, removed, False)
+                    added = []
+                    removed = []
+                    reported = True
+        
+        for directory in [d for d in self.dirs if d not in seen]:
+            removed.extend((directory, name) for name in self.dirs.pop(directory)[1])
+        added.extend(self.changed_rejects())
+        if added or removed or not self.scanned:
+            self.report(added, removed, True)
+            if self.on_scanned and not self.stop_event.is_set():
+                self.on_scanned()
+        self.scanned = True
+
+    def report(self, added, removed, scan_complete):
+        """Validate and queue added images in batches, so a large directory does not hold back its first images"""
+        start = 0
+        while True:
+            size = self.batch_size if self.reported_any else self.first_batch_size
+            batch = self.filter(added[start:start + size])
+            start += size
+            done = start >= len(added)
+            self.changes.put((batch, removed, scan_complete and done, None))
+            self.reported_any = self.reported_any or bool(batch)
+            removed = []
+            if done or self.stop_event.is_set():
+                return
+
+    def sync_remote(self, remote, full):
+        """Report the changes of one remote source as they arrive; errors do not stop the other roots"""
+        try:
+            for added, removed in remote.sync(full, self.batch_size):
+                if self.stop_event.is_set():
+                    return
+                self.changes.put((self.filter(added), removed, False, None))
+        except OSError as e:
+            self.changes.put(([], [], False, e))
+
+    @staticmethod
+    def signature(entry):
+        """Return (size, mtime) of a (dir, name) pair, or None if the file is gone"""
+        try:
+            stat = os.stat(os.path.join(*entry))
+        except OSError:
+            return None
+        return stat.st_size, stat.st_mtime_ns
+
+    def filter(self, added):
+        """Return the added images that pass validation, remembering the others"""
+        if not self.validate or not added:
+            return added
+        valid = self.validate(added)
+        if len(valid) < len(added):
+            accepted = set(valid)
+            for entry in added:
+                if entry not in accepted:
+                    self.rejected[entry] = self.signature(entry)
+        return valid
+
+    def changed_rejects(self):
+        """Take the rejected images that changed since, to be validated again"""
+        changed = []
+        for entry, signature in list(self.rejected.items()):
+            current = self.signature(entry)
+            if current != signature:
+                del self.rejected[entry]
+                # Deleted ones are reported as removed by the directory listing
+                if current is not None:
+                    changed.append(entry)
+        return changed
+
+    def run(self):
+        polls = 0
+        while not self.stop_event.is_set():
+            self.active.wait()
+            if self.stop_event.is_set():
+                return
+            try:
+                self.poll(full=polls % self.full_rescan_every == 0)
+            except OSError as e:
+                self.changes.put(([], [], True, e))
+            polls += 1
+            self.stop_event.wait(self.interval)
+
+
+class RenderEngine:
+    """Headless image pipeline that turns a path and a target size into a scaled frame"""
+
+    def __init__(self, frame_cache_bytes=0, preview_cache_dir=None, preview_cache_bytes=0,
+                 metadata_index=None, quality='lanczos', memory_limit=DECODE_MEMORY_LIMIT,
+                 max_pixels=MAX_SOURCE_PIXELS):
+        self.frame_cache = FrameCache(frame_cache_bytes)
+        self.preview_cache = None
+        if preview_cache_dir and preview_cache_bytes:
+            self.preview_cache = PreviewCache(preview_cache_dir, preview_cache_bytes)
+        self.metadata_index = metadata_index
+        self.quality = quality
+        self.memory_limit = memory_limit  # Pixel memory allowed for one decode
+        self.max_pixels = max_pixels  # Larger sources are refused from their header
+        self.scale = 1.0  # Below 1, decode smaller and stretch to the target, set by the governor
+        self.governor = None  # QualityGovernor told how long each render took
+        self.timings = None  # (path, size) -> breakdown of recent renders, while instrumentation is on
+        self.timings_lock = threading.Lock()
+        self.inflight = {}  # (path, size) -> Event set once a render in progress has finished
+        self.inflight_lock = threading.Lock()
+
+    def render(self, image_path, size):
+        """Return the scaled frame for an image, decoding it only on a cache miss"""
+        timings = {'source': 'file'} if self.timings is not None else None
+        scale = self.scale
+        # A reduced decode is cached at its own size and stretched on every use
+        target = size if scale >= 1.0 else (max(int(size[0] * scale), 1), max(int(size[1] * scale), 1))
+        frame = self.frame_cache.get(image_path, target)
+        if frame is None:
+            start = time.perf_counter()
+            frame = self.render_once(image_path, target, timings)
+            if self.governor is not None:
+                self.governor.record((time.perf_counter() - start) * 1000)
+        elif timings is not None:
+            timings['source'] = 'memory'
+        if scale < 1.0:
+            frame = frame.resize(fit_size(frame.width, frame.height, size[0], size[1]),
+                                 Image.Resampling.BILINEAR)
+        
+        if timings is not None:
+            with self.timings_lock:
+                self.timings[(image_path, tuple(size))] = timings
+                while len(self.timings) > 32:
+                    self.timings.popitem(last=False)
+        return frame
+
+    def render_once(self, image_path, size, timings):
+        """Render a cache miss, waiting for a render of the same frame already under way
+        (e.g. for another window) instead of repeating it"""
+        key = (image_path, tuple(size))
+        with self.inflight_lock:
+            done = self.inflight.get(key)
+            if done is None:
+                self.inflight[key] = threading.Event()
+        if done is not None:
+            done.wait()
+            frame = self.frame_cache.get(image_path, size)
+            if frame is not None:
+                if timings is not None:
+                    timings['source'] = 'shared'
+                return frame
+            # The other render failed or did not fit in the cache
+            return self.decode(image_path, size, timings)
+        
+        try:
+            frame = self.decode(image_path, size, timings)
+            self.frame_cache.put(image_path, size, frame)
+            return frame
+        finally:
+            with self.inflight_lock:
+                self.inflight.pop(key).set()
+
+    def decode(self, image_path, size, timings=None):
+        """Produce a scaled frame from the preview cache or the source file"""
+        if self.preview_cache:
+            # Indexed dimensions save reopening the file to decide whether a preview helps
+            header = self.metadata_index.get(image_path) if self.metadata_index else None
+            return self.preview_cache.render(image_path, size, self.quality,
+                                             source_size=header[:2] if header else None,
+                                             timings=timings, memory_limit=self.memory_limit,
+                                             max_pixels=self.max_pixels)
+        return render_image(image_path, size, self.quality, timings,
+                            self.memory_limit, self.max_pixels)
+
+    def take_timings(self, image_path, size):
+        """Return and forget the timing breakdown of the last render of image_path at size"""
+        if self.timings is None:
+            return None
+        with self.timings_lock:
+            return self.timings.pop((image_path, tuple(size)), None)
+
+
+def percentile(values, pct):
+    """Return the nearest-rank percentile of a non-empty list"""
+    ordered = sorted(values)
+    rank = max(math.ceil(pct / 100 * len(ordered)) - 1, 0)
+    return ordered[min(rank, len(ordered) - 1)]
+
+
+def memory_usage():
+    """Return the current and peak resident set size of this process in bytes"""
+    if sys.platform == 'win32':
+        import ctypes
+        from ctypes import wintypes
+
+        class ProcessMemoryCounters(ctypes.Structure):
+            _fields_ = [
+                ('cb', wintypes.DWORD),
+                ('PageFaultCount', wintypes.DWORD),
+                ('PeakWorkingSetSize', ctypes.c_size_t),
+                ('WorkingSetSize', ctypes.c_size_t),
+                ('QuotaPeakPagedPoolUsage', ctypes.c_size_t),
+                ('QuotaPagedPoolUsage', ctypes.c_size_t),
+                ('QuotaPeakNonPagedPoolUsage', ctypes.c_size_t),
+                ('QuotaNonPagedPoolUsage', ctypes.c_size_t),
+                ('PagefileUsage', ctypes.c_size_t),
+                ('PeakPagefileUsage', ctypes.c_size_t),
+            ]
+
+        counters = ProcessMemoryCounters()
+        counters.cb = ctypes.sizeof(counters)
+        ctypes.windll.psapi.GetProcessMemoryInfo(
+            ctypes.windll.kernel32.GetCurrentProcess(), ctypes.byref(counters), counters.cb)
+        return counters.WorkingSetSize, counters.PeakWorkingSetSize
+
+    import resource
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS reports bytes
+    peak = peak if sys.platform == 'darwin' else peak * 1024
+    current = peak
+    try:
+        with open('/proc/self/statm') as f:
+            current = int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, AttributeError):
+        pass  # No procfs, e.g. macOS: fall back to the peak
+    return current, peak
+
+
+def peak_rss_bytes():
+    """Return the peak resident set size of this process in bytes"""
+    return memory_usage()[1]
+
+
+class LoadMeter:
+    """Measure how busy the machine's processors are"""
+
+    def __init__(self):
+        self.last = None  # (idle, total) system times at the previous Windows sample
+
+    def sample(self):
+        """Return the system load as a fraction of all CPUs (1.0 = fully busy), or None if unknown
+
+        POSIX systems report the one-minute load average; on Windows it is the
+        CPU time spent outside the idle loop since the previous call.
+        """
+        if hasattr(os, 'getloadavg'):
+            try:
+                return os.getloadavg()[0] / (os.cpu_count() or 1)
+            except OSError:
+                return None
+        if sys.platform != 'win32':
+            return None
+        import ctypes
+        idle, kernel, user = (ctypes.c_ulonglong(), ctypes.c_ulonglong(), ctypes.c_ulonglong())
+        if not ctypes.windll.kernel32.GetSystemTimes(ctypes.byref(idle), ctypes.byref(kernel),
+                                                     ctypes.byref(user)):
+            return None
+        # Kernel time includes the idle time
+        times = (idle.value, kernel.value + user.value)
+        last, self.last = self.last, times
+        if last is None or times[1] <= last[1]:
+            return None
+        return 1.0 - (times[0] - last[0]) / (times[1] - last[1])
+
+
+class QualityGovernor:
+    """Trade rendering quality for speed when renders miss their time budget or the machine is busy
+
+    The renders of every window report how long they took. Each check looks
+    at the 90th percentile of the recent ones and at the system load and
+    moves at most one step through QUALITY_TIERS: down as soon as either is
+    over its threshold, up once both have had headroom for hold seconds
+    since the last change. Going back down soon after a step up doubles the
+    hold, so a machine on the edge of a tier does not flip between tiers.
+    """
+
+    def __init__(self, quality='lanczos', budget_ms=250.0, max_load=0.9, headroom=0.5, hold=30.0,
+                 window=8, min_samples=3, interval=2.0):
+        self.quality = quality  # Configured filter; no tier uses a better one
+        self.budget_ms = budget_ms
+        self.max_load = max_load
+        self.headroom = headroom  # Fraction of the budget and load limit that counts as idle
+        self.base_hold = hold
+        self.hold = hold
+        self.min_samples = min_samples
+        self.interval = interval  # Minimum seconds between checks
+        self.samples = deque(maxlen=window)  # Render times in ms since the last change
+        self.lock = threading.Lock()
+        self.load_meter = LoadMeter()
+        self.tier = 0
+        self.reason = 'starting at full quality'
+        self.changed_at = time.monotonic()
+        self.raised_at = None  # When the last step up happened
+        self.checked_at = 0.0
+        self.render_p90 = None
+        self.load = None
+        self.history = deque(maxlen=50)  # (timestamp, old tier, new tier, reason)
+
+    def record(self, render_ms):
+        """Add the time one render took; called from any thread"""
+        with self.lock:
+            self.samples.append(render_ms)
+
+    def settings(self, tier=None):
+        """Return (resample filter, decode scale, prefetch depth limit) of a tier, the current one by default"""
+        quality, scale, depth = QUALITY_TIERS[self.tier if tier is None else tier]
+        filters = list(RESAMPLE_FILTERS)
+        if filters.index(self.quality) > filters.index(quality):
+            quality = self.quality
+        return quality, scale, depth
+
+    def next_tier(self, direction):
+        """Return the next tier cheaper (+1) or better (-1) whose settings differ from the current ones, or None"""
+        current = self.settings()
+        tier = self.tier + direction
+        while 0 <= tier < len(QUALITY_TIERS) and self.settings(tier) == current:
+            tier += direction  # With a cheaper configured filter some tiers change nothing
+        if not 0 <= tier < len(QUALITY_TIERS):
+            return None
+        target = self.settings(tier)
+        while 0 <= tier + direction < len(QUALITY_TIERS) and self.settings(tier + direction) == target:
+            tier += direction
+        return tier
+
+    def prefetch_depth(self, depth):
+        """Limit a configured prefetch depth to what the current tier allows"""
+        limit = QUALITY_TIERS[self.tier][2]
+        return depth if limit is None else min(depth, limit)
+
+    def check(self):
+        """Re-evaluate the tier from the recent renders and the load; returns True if it changed"""
+        now = time.monotonic()
+        if now - self.checked_at < self.interval:
+            return False
+        self.checked_at = now
+        self.load = self.load_meter.sample()
+        with self.lock:
+            samples = list(self.samples)
+        self.render_p90 = percentile(samples, 90) if len(samples) >= self.min_samples else None
+        
+        cheaper = self.next_tier(+1)
+        if cheaper is not None:
+            if self.render_p90 is not None and self.render_p90 > self.budget_ms:
+                return self.step(cheaper, f"90% of renders took up to {self.render_p90:.0f} ms, "
+                                          f"over the {self.budget_ms:.0f} ms budget")
+            if self.load is not None and self.load > self.max_load:
+                return self.step(cheaper, f"system load {self.load:.2f} is over {self.max_load:.2f}")
+        better = self.next_tier(-1)
+        if better is not None and now - self.changed_at >= self.hold:
+            fast = self.render_p90 is None or self.render_p90 < self.budget_ms * self.headroom
+            idle = self.load is None or self.load < self.max_load * self.headroom
+            if fast and idle:
+                render = "no slow renders" if self.render_p90 is None else (
+                    f"90% of renders within {self.render_p90:.0f} ms")
+                load = "" if self.load is None else f", system load {self.load:.2f}"
+                return self.step(better, f"headroom for {now - self.changed_at:.0f} s: {render}{load}")
+        return False
+
+    def step(self, tier, reason):
+        """Move to a cheaper or better tier and log why"""
+        now = time.monotonic()
+        if tier < self.tier:
+            self.raised_at = now
+        elif self.raised_at is not None and now - self.raised_at < self.hold:
+            self.hold = min(self.hold * 2, 600.0)  # The last step up did not last
+        else:
+            self.hold = self.base_hold
+        old = self.tier
+        self.tier = tier
+        self.reason = reason
+        self.changed_at = now
+        with self.lock:
+            self.samples.clear()  # Times from the old tier say nothing about the new one
+        self.history.append((time.time(), old, self.tier, reason))
+        quality, scale, depth = self.settings()
+        print(f"Quality tier {old} -> {self.tier} ({quality}, decode scale {scale:g}, "
+              f"prefetch {'as configured' if depth is None else f'at most {depth}'}): {reason}")
+        return True
+
+    def status(self):
+        """Return the current tier, its settings, the last measurements and the recent changes"""
+        quality, scale, depth = self.settings()
+        return {
+            'tier': self.tier,
+            'tiers': len(QUALITY_TIERS),
+            'resample_quality': quality,
+            'decode_scale': scale,
+            'prefetch_limit': depth,
+            'reason': self.reason,
+            'since_s': round(time.monotonic() - self.changed_at, 1),
+            'render_p90_ms': None if self.render_p90 is None else round(self.render_p90, 1),
+            'load': None if self.load is None else round(self.load, 2),
+            'budget_ms': self.budget_ms,
+            'max_load': self.max_load,
+            'history': [{'time': round(t, 3), 'from': old, 'to': new, 'reason': reason}
+                        for t, old, new, reason in self.history],
+        }
+
+
+class PerfMonitor:
+    """Per-slide timing samples for the performance overlay and the metrics file"""
+
+    FIELDS = ('time', 'window', 'image', 'source', 'prefetched', 'decode_ms', 'resize_ms', 'render_ms',
+              'photo_ms', 'lateness_ms', 'cache_hit_rate', 'tier', 'rss_mb', 'error')
+
+    def __init__(self, metrics_file=''):
+        self.metrics_file = metrics_file  # .csv for CSV, anything else for JSON lines
+        self.file = None
+        self.writer = None
+        self.last = None
+
+    def record(self, sample):
+        """Keep a sample as the latest and append it to the metrics file, if one is set"""
+        sample['time'] = round(time.time(), 3)
+        sample['rss_mb'] = round(memory_usage()[0] / (1024 * 1024), 1)
+        for key in ('decode_ms', 'resize_ms', 'render_ms', 'photo_ms', 'lateness_ms'):
+            if key in sample:
+                sample[key] = round(sample[key], 2)
+        if 'cache_hit_rate' in sample:
+            sample['cache_hit_rate'] = round(sample['cache_hit_rate'], 3)
+        self.last = sample
+        if not self.metrics_file:
+            return
+        try:
+            if self.file is None:
+                self.file = open(self.metrics_file, 'a', newline='')
+                if self.metrics_file.lower().endswith('.csv'):
+                    self.writer = csv.DictWriter(self.file, fieldnames=self.FIELDS, extrasaction='ignore')
+                    if self.file.tell() == 0:
+                        self.writer.writeheader()
+            if self.writer:
+                self.writer.writerow(sample)
+            else:
+                self.file.write(json.dumps(sample) + '\n')
+            self.file.flush()
+        except OSError as e:
+            print(f"Error writing metrics: {str(e)}")
+            self.metrics_file = ''  # Don't retry on every slide
+
+    def summary(self):
+        """Return the latest sample as a few lines of overlay text"""
+        s = self.last
+        if s is None:
+            return "waiting for the first slide"
+        if 'error' in s:
+            return f"error: {s['error']}\nRSS {s['rss_mb']:.0f} MB"
+        source = s.get('source', '?') + (' (prefetched)' if s.get('prefetched') else '')
+        if 'tier' in s:
+            source += f", quality tier {s['tier']}"
+        return (f"{source}: {s.get('render_ms', 0):.1f} ms to frame\n"
+                f"decode {s.get('decode_ms', 0):.1f}  resize {s.get('resize_ms', 0):.1f}  "
+                f"photo {s.get('photo_ms', 0):.1f} ms\n"
+                f"cache hits {s.get('cache_hit_rate', 0):.0%}  late {s.get('lateness_ms', 0):.0f} ms  "
+                f"RSS {s['rss_mb']:.0f} MB")
+
+    def close(self):
+        if self.file:
+            self.file.close()
+            self.file = None
+
+
+def run_benchmark(folders, size, repeat=3, quality='lanczos', recursive=False,
+                  frame_cache_mb=0, preview_cache_dir=None, preview_cache_mb=0):
+    """Render every image in the folders through the headless engine and return timing figures"""
+    engine = RenderEngine(frame_cache_mb * 1024 * 1024, preview_cache_dir,
+                          preview_cache_mb * 1024 * 1024, quality=quality)
+    paths = list(iter_images(folders, recursive=recursive))
+    timings = []
+    failures = 0
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for path in paths:
+            frame_start = time.perf_counter()
+            try:
+                engine.render(path, size)
+            except Exception as e:
+                failures += 1
+                print(f"Error rendering {path}: {str(e)}", file=sys.stderr)
+                continue
+            timings.append((time.perf_counter() - frame_start) * 1000)
+    elapsed = time.perf_counter() - start
+    
+    result = {
+        'images': len(paths),
+        'frames': len(timings),
+        'failures': failures,
+        'size': list(size),
+        'quality': quality,
+        'throughput_fps': len(timings) / elapsed if elapsed else 0.0,
+        'peak_rss_mb': peak_rss_bytes() / (1024 * 1024),
+        'frame_cache': engine.frame_cache.stats(),
+    }
+    if timings:
+        for pct in (50, 90, 99):
+            result[f'p{pct}_ms'] = percentile(timings, pct)
+        result['max_ms'] = max(timings)
+    return result
+
+
+def configured_targets(config):
+    """Yield (folders, recursive, include, exclude, display size) for every window in a config dict"""
+    top = {key: value for key, value in config.items() if key != 'profiles'}
+    for settings in [top] + [dict(top, **profile) for profile in config.get('profiles', {}).values()]:
+        folders = settings.get('folders') or ([settings['folder']] if settings.get('folder') else [])
+        width, height = (int(v) for v in settings.get('geometry', '800x600').split('+')[0].split('x'))
+        # The custom title bar of borderless mode takes 22 pixels from the image
+        if settings.get('borderless', True):
+            height -= 22
+        yield (folders, settings.get('recursive', False), settings.get('include', []),
+               settings.get('exclude', []), (max(width, 1), max(height, 1)))
+
+
+def warm_preview(task):
+    """Process pool worker: build the cached preview for one image
+
+    Returns (path, status, source bytes, preview bytes, error).
+    """
+    image_path, preview_size, cache_dir, memory_limit, max_pixels = task
+    try:
+        source_bytes = os.path.getsize(image_path)
+        # No quota here: the parent prunes once when the batch is done
+        status, preview_bytes = PreviewCache(cache_dir, None).warm(
+            image_path, preview_size, memory_limit, max_pixels)
+        return image_path, status, source_bytes, preview_bytes, None
+    except Exception as e:
+        return image_path, 'failed', 0, 0, str(e)
+
+
+def warm_library(targets, cache_dir, max_bytes, workers=None, memory_limit=DECODE_MEMORY_LIMIT,
+                 max_pixels=MAX_SOURCE_PIXELS, metadata_index=None, progress=None):
+    """Build missing previews for every image of the targets in parallel and return a report
+
+    targets are (folders, recursive, include, exclude, display size) as from
+    configured_targets. Previews already in the cache for the current version
+    of a file are skipped, as are files the metadata index knows to be too
+    small for a preview or unreadable, so an interrupted or repeated run only
+    does the remaining work.
+    """
+    start = time.perf_counter()
+    cache = PreviewCache(cache_dir, max_bytes)
+    tasks = []
+    seen = set()
+    counts = {'built': 0, 'cached': 0, 'small': 0, 'unreadable': 0, 'missing': 0, 'failed': 0}
+    for folders, recursive, include, exclude, size in targets:
+        preview_size = PreviewCache.preview_size(size)
+        if preview_size is None:
+            continue  # Windows larger than the biggest preview read the originals
+        for path in iter_images(folders, recursive=recursive, include=include, exclude=exclude):
+            if (path, preview_size) in seen:
+                continue
+            seen.add((path, preview_size))
+            # Checking here saves starting work for files that are already done
+            entry = cache.entry_path(path, preview_size)
+            if entry is not None and cache.lookup(entry):
+                counts['cached'] += 1
+                continue
+            header = metadata_index.current(path) if metadata_index else None
+            if header is not None and header[0] is None:
+                counts['unreadable'] += 1
+                continue
+            if header is not None and max(header[:2]) <= preview_size:
+                counts['small'] += 1
+                continue
+            tasks.append((path, preview_size, cache_dir, memory_limit, max_pixels))
+    
+    source_bytes = preview_bytes = 0
+    errors = []
+    if tasks:
+        # Only --warm needs processes, so keep multiprocessing out of the widget's startup
+        from concurrent.futures import ProcessPoolExecutor, as_completed
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = [pool.submit(warm_preview, task) for task in tasks]
+            for done, future in enumerate(as_completed(futures), 1):
+                path, status, source, preview, error = future.result()
+                counts[status] += 1
+                if status == 'built':
+                    source_bytes += source
+                    preview_bytes += preview
+                elif error:
+                    errors.append((path, error))
+                # Remember files with nothing to build so the next run skips them
+                if status in ('small', 'failed') and metadata_index:
+                    metadata_index.check(path)
+                if progress and done % 100 == 0:
+                    progress(done, len(tasks))
+    elapsed = time.perf_counter() - start
+    
+    # Workers write without a quota; bring the cache back under it once
+    cached_bytes = sum(size for _, size, _ in cache.scan())
+    pruned = cached_bytes > max_bytes
+    if pruned:
+        cache.prune()
+    return {
+        'files': len(seen),
+        'processed': len(tasks),
+        **counts,
+        'errors': errors,
+        'elapsed_s': elapsed,
+        'files_per_s': len(tasks) / elapsed if elapsed else 0.0,
+        'source_bytes': source_bytes,
+        'preview_bytes': preview_bytes,
+        'bytes_saved': source_bytes - preview_bytes,
+        'cache_bytes': cached_bytes,
+        'cache_max_bytes': max_bytes,
+        'pruned': pruned,
+    }
+
+
+class Prefetcher:
+    """Decode and scale upcoming slides on worker threads ahead of display"""
+
+    def __init__(self, render, depth=2, workers=1, executor=None):
+        self.render = render  # Callable taking (path, size) and returning a frame
+        self.depth = depth
+        # Windows in one process share an executor; its owner shuts it down
+        self.owns_executor = executor is None
+        self.executor = executor or ThreadPoolExecutor(max_workers=workers, thread_name_prefix="prefetch")
+        self.pending = {}  # (path, size) -> Future
+        self.lock = threading.Lock()
+
+    def schedule(self, paths, size):
+        """Queue the given paths for decoding, dropping any work that is no longer wanted"""
+        wanted = [(path, size) for path in paths[:self.depth]]
+        with self.lock:
+            # Cancel work for other images or an outdated window size
+            for key in list(self.pending):
+                if key not in wanted:
+                    self.pending.pop(key).cancel()
+            for key in wanted:
+                if key not in self.pending:
+                    self.pending[key] = self.executor.submit(self.render, *key)
+
+    def request(self, path, size):
+        """Queue a single frame, dropping work queued for other sizes; returns False if disabled"""
+        if self.depth <= 0:
+            return False
+        with self.lock:
+            for key in list(self.pending):
+                if key[1] != size:
+                    self.pending.pop(key).cancel()
+            if (path, size) not in self.pending:
+                self.pending[(path, size)] = self.executor.submit(self.render, path, size)
+        return True
+
+    def ready(self, path, size):
+        """Check whether a queued frame has finished decoding"""
+        with self.lock:
+            future = self.pending.get((path, size))
+        return future is None or future.done()
+
+    def take(self, path, size):
+        """Return the prefetched frame for path at size, or None if it was never queued"""
+        with self.lock:
+            future = self.pending.pop((path, size), None)
+        # Work that has not started yet is cheaper to do inline than to wait for
+        if future is None or future.cancel():
+            return None
+        try:
+            return future.result()
+        except Exception:
+            return None
+
+    def cancel(self):
+        """Drop all queued prefetch work"""
+        with self.lock:
+            for future in self.pending.values():
+                future.cancel()
+            self.pending.clear()
+
+    def shutdown(self):
+        """Cancel outstanding work and stop the worker threads"""
+        self.cancel()
+        if self.owns_executor:
+            self.executor.shutdown(wait=False)
+
+
+class SlideScheduler:
+    """Advance the slideshow at absolute deadlines and stay silent while paused or stopped"""
+
+    def __init__(self, root, callback, interval_ms):
+        self.root = root
+        self.callback = callback
+        self.interval = interval_ms / 1000
+        self.deadline = None  # time.monotonic() at which the next slide is due
+        self.remaining = None  # Time left when paused
+        self.paused = False
+        self.after_id = None
+        self.wakeups = 0
+        self.lateness = 0.0  # Seconds the last slide fired after its deadline
+
+    @property
+    def active(self):
+        return self.deadline is not None or self.remaining is not None
+
+    def start(self):
+        """Schedule the next slide one interval from now"""
+        self.remaining = None
+        self.lateness = 0.0
+        self.deadline = time.monotonic() + self.interval
+        self.arm()
+
+    def stop(self):
+        """Cancel the schedule until start() is called again"""
+        self.cancel()
+        self.deadline = None
+        self.remaining = None
+
+    def set_interval(self, interval_ms):
+        """Change the interval, restarting the current wait if one is running"""
+        self.interval = interval_ms / 1000
+        if self.active:
+            self.start()
+
+    def pause(self):
+        """Stop waking up, remembering how long was left"""
+        if self.paused:
+            return
+        self.paused = True
+        self.cancel()
+        if self.deadline is not None:
+            self.remaining = max(self.deadline - time.monotonic(), 0)
+            self.deadline = None
+
+    def resume(self):
+        """Continue a paused schedule with the time that was left"""
+        if not self.paused:
+            return
+        self.paused = False
+        if self.remaining is not None:
+            self.deadline = time.monotonic() + self.remaining
+            self.remaining = None
+        self.arm()
+
+    def arm(self):
+        self.cancel()
+        if self.paused or self.deadline is None:
+            return
+        delay_ms = max(int((self.deadline - time.monotonic()) * 1000), 0)
+        self.after_id = self.root.after(delay_ms, self.fire)
+
+    def cancel(self):
+        if self.after_id:
+            self.root.after_cancel(self.after_id)
+            self.after_id = None
+
+    def fire(self):
+        self.after_id = None
+        self.wakeups += 1
+        # The next slide is due one interval after this one was due, not after it
+        # finished decoding, so neither decode time nor timer lateness accumulates
+        now = time.monotonic()
+        self.lateness = max(now - self.deadline, 0.0)
+        self.deadline += self.interval
+        if self.deadline < now:
+            # Fell more than an interval behind (e.g. the machine slept); start afresh
+            self.deadline = now + self.interval
+        self.callback()
+        self.arm()
+
+
+class ConfigStore:
+    """Coalesce config saves and show statistics and write them to the library on a
+    background thread after a quiet period"""
+
+    def __init__(self, library, delay=CONFIG_SAVE_DELAY):
+        self.library = library
+        self.delay = delay
+        self.pending = None  # Flattened config waiting to be written
+        self.shows = []  # (path, timestamp) of slides shown since the last write
+        self.version = 0  # Incremented on every save
+        self.written_version = 0
+        self.deadline = 0.0
+        self.lock = threading.Lock()
+        self.changed = threading.Condition(self.lock)
+        self.write_lock = threading.Lock()
+        self.thread = None
+
+    def save(self, config):
+        """Queue a config dict for writing; later saves replace earlier unwritten ones"""
+        rows = Library.flatten(config)
+        with self.lock:
+            self.version += 1
+            self.pending = (self.version, rows)
+            self.deadline = time.monotonic() + self.delay
+            if self.thread is None:
+                self.thread = threading.Thread(target=self.run, name="config-writer", daemon=True)
+                self.thread.start()
+            self.changed.notify()
+
+    def record_show(self, path):
+        """Queue one showing of an image for the per-image statistics"""
+        with self.lock:
+            if not self.shows and self.pending is None:
+                self.deadline = time.monotonic() + self.delay
+            self.shows.append((path, time.time()))
+            if self.thread is None:
+                self.thread = threading.Thread(target=self.run, name="config-writer", daemon=True)
+                self.thread.start()
+            self.changed.notify()
+
+    def run(self):
+        while True:
+            with self.lock:
+                # Wait for a change, then until no further change has arrived for delay seconds
+                while (self.pending is None and not self.shows) or time.monotonic() < self.deadline:
+                    idle = self.pending is None and not self.shows
+                    self.changed.wait(None if idle else self.deadline - time.monotonic())
+                pending, shows = self.pending, self.shows
+                self.pending, self.shows = None, []
+            try:
+                self.write(pending, shows)
+            except sqlite3.Error as e:
+                print(f"Error saving configuration: {str(e)}")
+
+    def write(self, pending, shows):
+        """Write a flattened config unless a newer one has already been written, and the show counts"""
+        with self.write_lock:
+            if pending is not None and pending[0] > self.written_version:
+                self.library.write_settings(pending[1])
+                self.written_version = pending[0]
+            if shows:
+                self.library.record_shows(shows)
+
+    def flush(self):
+        """Write anything pending now on the calling thread; returns the error, if any"""
+        with self.lock:
+            pending, shows = self.pending, self.shows
+            self.pending, self.shows = None, []
+        if pending is None and not shows:
+            return None
+        try:
+            self.write(pending, shows)
+        except sqlite3.Error as e:
+            return e
+        return None
+
+
+class WidgetHost:
+    """Config file, decode pool and caches shared by all widget windows in this process
+
+    The top level of the config file holds the main window's settings and the
+    shared ones; every further window is a profile under "profiles" holding
+    all of its own settings, copied from the window it was opened from. Only
+    the shared settings, and keys a profile lacks, come from the top level.
+    """
+
+    def __init__(self, root, config_file=None):
+        self.root = root
+        # Settings used to live in this JSON file; it is only read once, to migrate it
+        self.config_file = config_file or os.path.join(os.path.expanduser("~"),
+                                                       "motivation_widget_config.json")
+        config_dir = os.path.dirname(self.config_file)
+        try:
+            self.library = open_library(config_dir)
+            self.config = self.library.load_settings()
+        except (sqlite3.Error, ValueError) as e:
+            messagebox.showerror("Error", f"Error loading configuration: {str(e)}")
+            # Keep running on defaults; nothing is saved this session
+            self.library = Library(':memory:')
+            self.config = {'profiles': {}}
+        self.config_store = ConfigStore(self.library)
+        self.shown_times = None  # Path -> last shown, read on first use by the least recent order
+        self.widgets = []
+        
+        self.metadata_index = MetadataIndex(self.library)
+        self.metadata_index.load_in_background()
+        
+        # One engine, and so one frame cache and preview cache, for every window
+        config = self.config
+        quality = config.get('resample_quality', 'lanczos')
+        self.engine = RenderEngine(
+            max(int(config.get('frame_cache_mb', 128)), 0) * 1024 * 1024,
+            os.path.join(config_dir, "motivation_widget_cache"),
+            max(int(config.get('preview_cache_mb', 512)), 0) * 1024 * 1024,
+            metadata_index=self.metadata_index,
+            quality=quality if quality in RESAMPLE_FILTERS else 'lanczos',
+            memory_limit=max(int(config.get('decode_memory_mb', DECODE_MEMORY_LIMIT // (1024 * 1024))), 16)
+            * 1024 * 1024,
+            max_pixels=max(int(config.get('max_image_megapixels', MAX_SOURCE_PIXELS // 1000000)), 1)
+            * 1000000)
+        self.executor = ThreadPoolExecutor(max_workers=max(int(config.get('decode_workers', 2)), 1),
+                                           thread_name_prefix="decode")
+        self.governor = None
+        if config.get('adaptive_quality', True):
+            self.governor = QualityGovernor(self.engine.quality,
+                                            budget_ms=max(float(config.get('render_budget_ms', 250)), 1.0),
+                                            max_load=max(float(config.get('max_load', 0.9)), 0.05))
+            self.engine.governor = self.governor
+        # Remote sources of every window share one set of keep-alive connections and one cache
+        self.remote_pool = ConnectionPool(max(int(config.get('remote_connections', 4)), 1))
+        self.remote_dir = os.path.join(config_dir, "motivation_widget_remote")
+
+    def settings(self, profile):
+        """Return the settings of a window: the top level, overridden by its profile"""
+        settings = {key: value for key, value in self.config.items() if key != 'profiles'}
+        if profile is not None:
+            settings.update(self.config['profiles'].get(profile, {}))
+        return settings
+
+    def save(self, profile, settings):
+        """Store a window's settings and queue the config file to be written"""
+        if profile is None:
+            self.config.update(settings)
+        else:
+            self.config['profiles'][profile] = {
+                key: value for key, value in settings.items() if key not in SHARED_SETTINGS}
+        self.config_store.save(self.config)
+
+    def last_shown(self):
+        """Return path -> time each image was last shown, for the least recent order"""
+        if self.shown_times is None:
+            try:
+                self.shown_times = self.library.last_shown()
+            except sqlite3.Error as e:
+                print(f"Error loading show statistics: {str(e)}")
+                self.shown_times = {}
+        return self.shown_times
+
+    def record_show(self, path):
+        """Count one showing of an image"""
+        self.config_store.record_show(path)
+        if self.shown_times is not None:
+            self.shown_times[path] = time.time()
+
+    def prefetch_depth(self, depth):
+        """Return a window's prefetch depth as limited by the current quality tier"""
+        return self.governor.prefetch_depth(depth) if self.governor else depth
+
+    def check_quality(self):
+        """Let the governor re-evaluate the tier and apply a change to the engine and every window"""
+        if self.governor is None or not self.governor.check():
+            return
+        quality, scale, _ = self.governor.settings()
+        self.engine.quality = quality
+        self.engine.scale = scale
+        for widget in self.widgets:
+            widget.prefetcher.depth = self.prefetch_depth(widget.prefetch_depth)
+
+    def open_remote(self, url, include=None, exclude=None):
+        """Create the mirror a folder watcher uses for a remote image source"""
+        return RemoteMirror(url, self.remote_dir, self.library, self.remote_pool, include, exclude)
+
+    def open_profiles(self):
+        """Open a window for every saved profile"""
+        for profile in list(self.config['profiles']):
+            self.open_window(profile)
+
+    def open_window(self, profile):
+        """Create a top-level window showing the given profile"""
+        window = tk.Toplevel(self.root)
+        window.minsize(300, 200)
+        widget = ImageWidget(window, host=self, profile=profile)
+        window.bind("<Configure>", widget.handle_resize)
+        window.protocol("WM_DELETE_WINDOW", widget.close_window)
+        return widget
+
+    def new_window(self, source):
+        """Open another window, starting from a copy of source's settings"""
+        number = 2
+        while f"Window {number}" in self.config['profiles']:
+            number += 1
+        profile = f"Window {number}"
+        settings = source.settings()
+        for key in ('current_image', 'current_image_index', 'snapshot_geometry'):
+            settings.pop(key, None)
+        # Open it offset from the source so both stay visible
+        size = source.root.geometry().split('+')[0]
+        settings['geometry'] = f"{size}+{source.root.winfo_x() + 40}+{source.root.winfo_y() + 40}"
+        self.save(profile, settings)
+        return self.open_window(profile)
+
+    def forget(self, widget):
+        """Drop a closed window and its profile"""
+        self.widgets.remove(widget)
+        self.config['profiles'].pop(widget.profile, None)
+        self.config_store.save(self.config)
+
+    def exit(self):
+        """Save every window's state, stop background work and leave the event loop"""
+        for widget in list(self.widgets):
+            widget.shutdown()
+        error = self.config_store.flush()
+        if error:
+            messagebox.showerror("Error", f"Error saving configuration: {str(error)}")
+        self.executor.shutdown(wait=False)
+        self.remote_pool.close()
+        self.metadata_index.save()
+        self.library.close()
+        self.root.quit()
 
-import win32com.client
 
 class ImageWidget:
-    def __init__(self, root):
+    def __init__(self, root, on_first_frame=None, host=None, profile=None):
         self.root = root
-        self.root.title("Motivation Widget")
+        self.on_first_frame = on_first_frame  # Called once the first image is on screen
+        self.root.title("Motivation Widget" if profile is None else f"Motivation Widget - {profile}")
         self.root.geometry("800x600")
         
-        # Config file path
-        self.config_file = os.path.join(os.path.expanduser("~"), "motivation_widget_config.json")
+        # Config file, caches and decode workers are shared with other windows
+        self.host = host or WidgetHost(root)
+        self.profile = profile  # Name under "profiles" in the config file, None for the main window
+        self.host.widgets.append(self)
+        self.config_file = self.host.config_file
         
         # Initialize variables
-        self.image_folder = ""
-        self.images = []
+        self.image_folders = []
+        self.recursive = False  # Include images in subfolders
+        self.include_patterns = []  # Glob patterns images must match, empty for all
+        self.exclude_patterns = []  # Glob patterns for files and folders to skip
+        self.images = ImageList()
         self.current_image_index = 0
+        self.order = 'sequential'  # One of ORDER_STRATEGIES
+        self.folder_weights = {}  # Folder path -> weight for the weighted order
+        self.image_weights = {}  # Image path -> weight, overrides the folder weight
+        self.sequencer = Sequencer()
         self.delay = 15000  # Default 15 seconds
         self.running = False
-        self.current_photo = None  # Prevents garbage collection of the photo
         self.always_on_top = True
         self.position_locked = False
         self.dark_mode = False
         self.is_borderless = True
         self.in_startup = False
-        self.timer_id = None
+        self.scheduler = None
+        self.hidden = False
+        self.hidden_since = None
+        self.advance_on_restore = False
+        self.restart_animation = False
+        self.measure_power = False  # Print wakeups and CPU time used while hidden
         self.resize_timer = None
+        self.window_size = None
+        self.prefetch_depth = 2  # Number of upcoming slides decoded ahead of time
+        self.frame_cache_mb = 128  # Memory budget for already scaled frames
+        self.preview_cache_mb = 512  # Disk quota for downscaled previews, 0 to disable
+        self.resample_quality = 'lanczos'  # One of RESAMPLE_FILTERS, trades quality for speed
+        self.animation_memory_mb = 64  # Animations up to this size are decoded once and replayed
+        self.decode_memory_mb = DECODE_MEMORY_LIMIT // (1024 * 1024)  # Ceiling for decoding one image
+        self.max_image_megapixels = MAX_SOURCE_PIXELS // 1000000  # Larger images are skipped
+        self.animation = None
+        self.transition_style = 'none'  # One of TRANSITION_STYLES
+        self.transition_ms = 600
+        self.transition_fps = 30
+        self.measure_transitions = False  # Print frame timing after each transition
+        self.perf_overlay = False  # Show per-slide timings over the image
+        self.metrics_file = ''  # Append per-slide timings here (.csv or JSON lines)
+        self.perf = None  # PerfMonitor, only while the overlay or metrics file is on
+        self.perf_label = None
+        self.perf_sample = None  # Timings of the slide waiting for display_frame
+        self.active_transition = None
+        self.current_frame = None  # Scaled image currently on screen
+        self.first_frame_shown = False
+        # Last slide of the previous session, painted at launch before any decoding
+        snapshot_name = "motivation_widget_snapshot.png" if profile is None else (
+            f"motivation_widget_snapshot_{hashlib.sha1(profile.encode('utf-8')).hexdigest()[:12]}.png")
+        self.snapshot_file = os.path.join(os.path.dirname(self.config_file), snapshot_name)
+        self.snapshot_geometry = None
+        self.snapshot_photo = None
+        self.saved_geometry = '800x600'
+        self.resume_entry = None  # (directory, name) of the image to resume from
+        self.resume_index = 0  # Fallback position if that image is gone
+        self.resume_found = False
+        self.rescan_interval = 5  # Seconds between checks of the folder for added or removed files
+        self.folder_watcher = None
+        self.watch_timer = None
+        self.folder_polls = 0
+        self.metadata_index = self.host.metadata_index
+        self.initial_scan_done = False
         self.drag_data = {"x": 0, "y": 0}
         self.menu_showing = False
         
         # Load saved configuration and check startup status
         self.load_config()
         self.check_if_in_startup()
+        self.scheduler = SlideScheduler(self.root, self.next_image, self.delay)
+        self.engine = self.host.engine
+        self.prefetcher = Prefetcher(self.engine.render, depth=self.host.prefetch_depth(self.prefetch_depth),
+                                     executor=self.host.executor)
         
         # Apply window settings
         self.root.attributes("-topmost", self.always_on_top)
         
-        # Create UI components
+        # Create UI components; the overlay is placed over the main frame
         self.create_ui()
+        self.update_instrumentation()
         
-        # Load images if we have a saved folder
-        if self.image_folder:
-            self.load_images()
-            if self.images:
-                self.running = True
-                # Wait for window to render before showing the first image
-                self.root.after(100, self.next_image)
+        # Paint the last frame of the previous session while the folder is indexed
+        if self.image_folders:
+            self.show_snapshot()
+            self.load_images(resume=True)
 
     def create_ui(self):
         """Create all UI components including main frame, title bar and image display"""
@@ -65,7 +2906,7 @@ class ImageWidget:
         self.title_label = tk.Label(self.title_bar, text="Motivation Widget", font=('Arial', 9))
         self.title_label.pack(side=tk.LEFT, padx=10)
         
-        self.close_button = tk.Button(self.title_bar, text="✕", command=self.exit_app, 
+        self.close_button = tk.Button(self.title_bar, text="✕", command=self.close_window, 
                                     borderwidth=0, highlightthickness=0, font=('Arial', 9), width=3)
         self.close_button.pack(side=tk.RIGHT)
         
@@ -78,8 +2919,9 @@ class ImageWidget:
         self.title_bar.bind("<B1-Motion>", self.on_motion)
         
         # Image display area
-        self.image_label = tk.Label(self.main_frame)
+        self.image_label = tk.Label(self.main_frame, borderwidth=0, padx=0, pady=0)
         self.image_label.pack(fill=tk.BOTH, expand=True)
+        self.presenter = FramePresenter(self.image_label, self.image_label.cget('bg'))
         
         # Create right-click menu
         self.create_menus()
@@ -89,6 +2931,10 @@ class ImageWidget:
         self.main_frame.bind("<Button-3>", self.show_menu)
         self.image_label.bind("<Button-3>", self.show_menu)
         
+        # Pause all periodic work while the window is minimized or withdrawn
+        self.root.bind("<Unmap>", self.on_unmap)
+        self.root.bind("<Map>", self.on_map)
+        
         # Apply theme and window style
         self.apply_theme()
         self.apply_window_style()
@@ -129,12 +2975,83 @@ class ImageWidget:
         if self.always_on_top:
             self.root.attributes("-topmost", True)
 
+    def on_unmap(self, event):
+        """Pause the slideshow when the main window is hidden"""
+        if event.widget is self.root and not self.hidden:
+            self.set_hidden(True)
+
+    def on_map(self, event):
+        """Resume the slideshow when the main window is shown again"""
+        if event.widget is self.root and self.hidden:
+            self.set_hidden(False)
+
+    def set_hidden(self, hidden):
+        """Stop or restart timers, animation and folder polling as the window hides or shows"""
+        self.hidden = hidden
+        if hidden:
+            self.hidden_since = (time.monotonic(), time.process_time(),
+                                 self.scheduler.wakeups + self.folder_polls)
+            self.scheduler.pause()
+            # Leave the new slide on screen rather than a half-blended frame
+            self.skip_transition()
+            was_animating = self.animation is not None
+            # A slide change waiting for the animation loop happens on restore instead
+            self.advance_on_restore = self.stop_animation() is not None
+            self.restart_animation = was_animating and not self.advance_on_restore
+            if self.folder_watcher:
+                self.folder_watcher.pause()
+            if self.watch_timer:
+                self.root.after_cancel(self.watch_timer)
+                self.watch_timer = None
+            return
+        
+        if self.measure_power and self.hidden_since:
+            started, cpu, wakeups = self.hidden_since
+            print(f"Hidden for {time.monotonic() - started:.1f} s: "
+                  f"{self.scheduler.wakeups + self.folder_polls - wakeups} wakeups, "
+                  f"{(time.process_time() - cpu) * 1000:.1f} ms CPU")
+        self.hidden_since = None
+        if self.folder_watcher:
+            self.folder_watcher.resume()
+            self.watch_timer = self.root.after(0, self.apply_folder_changes)
+        self.scheduler.resume()
+        if self.advance_on_restore:
+            self.advance_on_restore = False
+            self.next_image()
+        elif self.restart_animation:
+            self.show_image()
+        self.restart_animation = False
+
     def create_menus(self):
         """Create the right-click context menu with all settings options"""
         self.menu = Menu(self.root, tearoff=0)
         self.menu.add_command(label="Select Folder", command=self.select_folder)
+        self.menu.add_command(label="Add Folder", command=self.add_folder)
+        self.menu.add_command(label="Add Remote Source", command=self.add_remote_source)
+        
+        self.recursive_var = tk.BooleanVar(value=self.recursive)
+        self.menu.add_checkbutton(label="Include Subfolders", 
+                                command=self.toggle_recursive, 
+                                variable=self.recursive_var)
         self.menu.add_command(label="Set Duration (seconds)", command=self.set_duration)
         
+        # Transition style submenu
+        self.transition_var = tk.StringVar(value=self.transition_style)
+        transition_menu = Menu(self.menu, tearoff=0)
+        for style in TRANSITION_STYLES:
+            transition_menu.add_radiobutton(label=style.capitalize(), value=style,
+                                            variable=self.transition_var,
+                                            command=self.set_transition)
+        self.menu.add_cascade(label="Transition", menu=transition_menu)
+        
+        # Ordering strategy submenu
+        self.order_var = tk.StringVar(value=self.order)
+        order_menu = Menu(self.menu, tearoff=0)
+        for order in ORDER_STRATEGIES:
+            order_menu.add_radiobutton(label=order.replace('_', ' ').capitalize(), value=order,
+                                       variable=self.order_var, command=self.set_order)
+        self.menu.add_cascade(label="Order", menu=order_menu)
+        
         # Toggle options with checkboxes
         self.always_on_top_var = tk.BooleanVar(value=self.always_on_top)
         self.menu.add_checkbutton(label="Always on Top", 
@@ -162,7 +3079,17 @@ class ImageWidget:
             command=self.toggle_startup, 
             variable=self.startup_var)
         
+        self.perf_overlay_var = tk.BooleanVar(value=self.perf_overlay)
+        self.menu.add_checkbutton(label="Performance Overlay",
+                                command=self.toggle_perf_overlay,
+                                variable=self.perf_overlay_var)
+        if self.host.governor:
+            self.menu.add_command(label="Quality Status", command=self.show_quality_status)
+        
         self.menu.add_separator()
+        self.menu.add_command(label="New Window", command=self.new_window)
+        if self.profile is not None:
+            self.menu.add_command(label="Close Window", command=self.close_window)
         self.menu.add_command(label="Exit", command=self.exit_app)
     
     def check_if_in_startup(self):
@@ -179,36 +3106,96 @@ class ImageWidget:
             self.in_startup = False
 
     def load_config(self):
-        """Load saved settings from config file"""
+        """Load this window's saved settings"""
         try:
-            if os.path.exists(self.config_file):
-                with open(self.config_file, 'r') as f:
-                    config = json.load(f)
-                    self.image_folder = config.get('folder', '')
-                    self.delay = config.get('delay', 15000)
-                    self.always_on_top = config.get('always_on_top', True)
-                    self.position_locked = config.get('position_locked', False)
-                    self.dark_mode = config.get('dark_mode', False)
-                    self.is_borderless = config.get('borderless', True)
-                    geometry = config.get('geometry', '800x600')
-                    self.root.geometry(geometry)
+            config = self.host.settings(self.profile)
+            if config:
+                self.image_folders = config.get('folders') or (
+                    [config['folder']] if config.get('folder') else [])
+                self.recursive = config.get('recursive', False)
+                self.include_patterns = config.get('include', [])
+                self.exclude_patterns = config.get('exclude', [])
+                self.delay = config.get('delay', 15000)
+                self.always_on_top = config.get('always_on_top', True)
+                self.position_locked = config.get('position_locked', False)
+                self.dark_mode = config.get('dark_mode', False)
+                self.is_borderless = config.get('borderless', True)
+                self.prefetch_depth = max(int(config.get('prefetch_depth', 2)), 0)
+                self.frame_cache_mb = max(int(config.get('frame_cache_mb', 128)), 0)
+                self.preview_cache_mb = max(int(config.get('preview_cache_mb', 512)), 0)
+                self.resample_quality = config.get('resample_quality', 'lanczos')
+                if self.resample_quality not in RESAMPLE_FILTERS:
+                    self.resample_quality = 'lanczos'
+                self.rescan_interval = max(float(config.get('rescan_interval', 5)), 0.5)
+                self.animation_memory_mb = max(int(config.get('animation_memory_mb', 64)), 0)
+                self.decode_memory_mb = max(int(config.get('decode_memory_mb', self.decode_memory_mb)), 16)
+                self.max_image_megapixels = max(
+                    int(config.get('max_image_megapixels', self.max_image_megapixels)), 1)
+                self.order = config.get('order', 'sequential')
+                if self.order not in ORDER_STRATEGIES:
+                    self.order = 'sequential'
+                self.folder_weights = config.get('folder_weights', {})
+                self.image_weights = config.get('image_weights', {})
+                self.transition_style = config.get('transition', 'none')
+                if self.transition_style not in TRANSITION_STYLES:
+                    self.transition_style = 'none'
+                self.transition_ms = max(int(config.get('transition_ms', 600)), 0)
+                self.transition_fps = max(int(config.get('transition_fps', 30)), 1)
+                self.measure_transitions = config.get('measure_transitions', False)
+                self.measure_power = config.get('measure_power', False)
+                self.perf_overlay = config.get('perf_overlay', False)
+                self.metrics_file = config.get('metrics_file', '')
+                geometry = config.get('geometry', '800x600')
+                self.root.geometry(geometry)
+                self.saved_geometry = geometry.split('+')[0]
+                self.snapshot_geometry = config.get('snapshot_geometry')
+                if config.get('current_image'):
+                    self.resume_entry = tuple(os.path.split(config['current_image']))
+                self.resume_index = max(int(config.get('current_image_index', 0)), 0)
         except Exception as e:
             messagebox.showerror("Error", f"Error loading configuration: {str(e)}")
     
+    def settings(self):
+        """Return this window's settings as stored in the config file"""
+        return {
+            'folder': self.image_folders[0] if self.image_folders else '',
+            'folders': self.image_folders,
+            'recursive': self.recursive,
+            'include': self.include_patterns,
+            'exclude': self.exclude_patterns,
+            'delay': self.delay,
+            'always_on_top': self.always_on_top,
+            'position_locked': self.position_locked,
+            'dark_mode': self.dark_mode,
+            'borderless': self.is_borderless,
+            'prefetch_depth': self.prefetch_depth,
+            'frame_cache_mb': self.frame_cache_mb,
+            'preview_cache_mb': self.preview_cache_mb,
+            'resample_quality': self.resample_quality,
+            'rescan_interval': self.rescan_interval,
+            'animation_memory_mb': self.animation_memory_mb,
+            'decode_memory_mb': self.decode_memory_mb,
+            'max_image_megapixels': self.max_image_megapixels,
+            'order': self.order,
+            'folder_weights': self.folder_weights,
+            'image_weights': self.image_weights,
+            'transition': self.transition_style,
+            'transition_ms': self.transition_ms,
+            'transition_fps': self.transition_fps,
+            'measure_transitions': self.measure_transitions,
+            'measure_power': self.measure_power,
+            'perf_overlay': self.perf_overlay,
+            'metrics_file': self.metrics_file,
+            'geometry': self.root.geometry(),
+            'current_image': self.current_image_path(),
+            'current_image_index': self.current_image_index if self.images else self.resume_index,
+            'snapshot_geometry': self.snapshot_geometry,
+        }
+    
     def save_config(self):
-        """Save current settings to config file"""
+        """Queue current settings to be written to the config file in the background"""
         try:
-            config = {
-                'folder': self.image_folder,
-                'delay': self.delay,
-                'always_on_top': self.always_on_top,
-                'position_locked': self.position_locked,
-                'dark_mode': self.dark_mode,
-                'borderless': self.is_borderless,
-                'geometry': self.root.geometry()
-            }
-            with open(self.config_file, 'w') as f:
-                json.dump(config, f)
+            self.host.save(self.profile, self.settings())
         except Exception as e:
             messagebox.showerror("Error", f"Error saving configuration: {str(e)}")
     
@@ -236,6 +3223,10 @@ class ImageWidget:
                 self.close_button.configure(bg=button_bg, fg=fg_color, activebackground="#FF6B6B")
                 self.minimize_button.configure(bg=button_bg, fg=fg_color, activebackground="#AAAAAA")
             self.image_label.configure(bg=bg_color)
+            self.presenter.background = bg_color
+            # The margins around the image are part of the frame, so repaint it
+            if self.current_frame is not None and not self.animation and not self.active_transition:
+                self.presenter.show(self.current_frame, self.get_display_size())
             
     def apply_window_style(self):
         """Apply borderless or normal window style"""
@@ -280,6 +3271,9 @@ class ImageWidget:
             self.menu.unpost()
         
         # Update checkboxes to match current settings
+        self.recursive_var.set(self.recursive)
+        self.transition_var.set(self.transition_style)
+        self.order_var.set(self.order)
         self.always_on_top_var.set(self.always_on_top)
         self.position_locked_var.set(self.position_locked)
         self.dark_mode_var.set(self.dark_mode)
@@ -313,6 +3307,73 @@ class ImageWidget:
         self.apply_theme()
         self.save_config()
     
+    def toggle_perf_overlay(self):
+        """Toggle the per-slide timing overlay"""
+        self.menu.unpost()
+        self.menu_showing = False
+        self.perf_overlay = self.perf_overlay_var.get()
+        self.update_instrumentation()
+        self.save_config()
+    
+    def update_instrumentation(self):
+        """Turn timing collection on only while the overlay or the metrics file needs it"""
+        if self.perf_overlay or self.metrics_file:
+            if self.perf is None:
+                self.perf = PerfMonitor(self.metrics_file)
+                if self.engine.timings is None:
+                    self.engine.timings = OrderedDict()
+        elif self.perf is not None:
+            self.perf.close()
+            self.perf = None
+            self.perf_sample = None
+            # The engine is shared, so keep timing while another window wants it
+            if not any(widget.perf for widget in self.host.widgets):
+                self.engine.timings = None
+        
+        if self.perf_overlay and self.perf_label is None:
+            self.perf_label = tk.Label(self.main_frame, font=('Consolas', 8), justify=tk.LEFT,
+                                       bg='black', fg='#7CFC00', anchor='w')
+            self.perf_label.bind("<Button-3>", self.show_menu)
+            self.perf_label.place(x=4, rely=1.0, y=-4, anchor='sw')
+            self.update_overlay()
+        elif not self.perf_overlay and self.perf_label is not None:
+            self.perf_label.destroy()
+            self.perf_label = None
+    
+    def update_overlay(self):
+        """Refresh the overlay with the latest sample"""
+        if self.perf_label is not None:
+            self.perf_label.config(text=self.perf.summary())
+            self.perf_label.lift()
+    
+    def show_quality_status(self):
+        """Show the quality governor's current tier, why it was chosen and the recent changes"""
+        self.menu.unpost()
+        self.menu_showing = False
+        status = self.host.governor.status()
+        prefetch = 'as configured' if status['prefetch_limit'] is None else f"at most {status['prefetch_limit']}"
+        render = 'no recent renders' if status['render_p90_ms'] is None else f"{status['render_p90_ms']:.0f} ms"
+        load = 'unknown' if status['load'] is None else f"{status['load']:.2f}"
+        lines = [
+            f"Tier {status['tier']} of {status['tiers'] - 1}: {status['resample_quality']} filter, "
+            f"decode scale {status['decode_scale']:g}, prefetch {prefetch}",
+            f"Since {status['since_s']:.0f} s ago: {status['reason']}",
+            f"90% of renders: {render} (budget {status['budget_ms']:.0f} ms)",
+            f"System load: {load} (limit {status['max_load']:.2f})",
+        ]
+        if status['history']:
+            lines.append("\nRecent changes:")
+            lines.extend(f"{time.strftime('%H:%M:%S', time.localtime(change['time']))} "
+                         f"tier {change['from']} -> {change['to']}: {change['reason']}"
+                         for change in status['history'][-5:])
+        messagebox.showinfo("Quality Status", "\n".join(lines))
+
+    def record_perf(self, sample):
+        """Store a finished slide sample and show it"""
+        sample['window'] = self.profile or 'main'
+        self.perf.record(sample)
+        self.update_overlay()
+    
     def toggle_borderless(self):
         """Toggle between borderless and normal window style"""
         self.menu.unpost()
@@ -352,17 +3413,67 @@ class ImageWidget:
         
         folder = filedialog.askdirectory()
         if folder:
-            self.image_folder = folder
+            self.image_folders = [folder]
+            self.save_config()
+            self.prefetcher.cancel()
+            self.load_images()
+
+    def add_folder(self):
+        """Open folder selection dialog and add the folder to the image sources"""
+        # Hide menu
+        if self.menu_showing:
+            self.menu.unpost()
+            self.menu_showing = False
+        
+        folder = filedialog.askdirectory()
+        if folder and folder not in self.image_folders:
+            self.image_folders.append(folder)
+            self.save_config()
+            self.load_images()
+
+    def add_remote_source(self):
+        """Ask for the URL of an image manifest and add it to the image sources"""
+        if self.menu_showing:
+            self.menu.unpost()
+            self.menu_showing = False
+        
+        url = simpledialog.askstring("Add Remote Source", "URL of the image manifest (JSON):",
+                                     parent=self.root)
+        if not url:
+            return
+        url = url.strip()
+        if not is_remote(url):
+            messagebox.showerror("Error", "The address must start with http:// or https://.")
+            return
+        if url not in self.image_folders:
+            self.image_folders.append(url)
             self.save_config()
             self.load_images()
-            if self.images:
-                self.running = True
-                # Reset timer for image rotation
-                if self.timer_id:
-                    self.root.after_cancel(self.timer_id)
-                self.show_image()
-                self.timer_id = self.root.after(self.delay, self.next_image)
+
+    def toggle_recursive(self):
+        """Toggle whether images in subfolders are included"""
+        self.menu.unpost()
+        self.menu_showing = False
+        self.recursive = self.recursive_var.get()
+        self.save_config()
+        if self.image_folders:
+            self.load_images()
     
+    def set_transition(self):
+        """Apply the transition style chosen in the menu"""
+        self.menu.unpost()
+        self.menu_showing = False
+        self.transition_style = self.transition_var.get()
+        self.save_config()
+
+    def set_order(self):
+        """Apply the slideshow order chosen in the menu"""
+        self.menu.unpost()
+        self.menu_showing = False
+        self.order = self.order_var.get()
+        self.reset_sequencer()
+        self.save_config()
+
     def set_duration(self):
         """Open dialog to set image display duration"""
         # Hide menu first
@@ -443,89 +3554,460 @@ class ImageWidget:
             self.delay = result[0] * 1000
             self.save_config()
             # Reset timer if slideshow is running
-            if self.running and self.timer_id:
-                self.root.after_cancel(self.timer_id)
-                self.timer_id = self.root.after(self.delay, self.next_image)
+            self.scheduler.set_interval(self.delay)
 
-    def load_images(self):
-        """Load all valid images from the selected folder"""
-        self.images = []
-        valid_extensions = {'.jpg', '.jpeg', '.png', '.gif', '.bmp'}
+    def load_images(self, resume=False):
+        """Start indexing the selected folder in the background"""
+        self.stop_watching()
+        self.resume_found = False
+        if not resume:
+            self.resume_entry = None
+            self.resume_index = 0
         
-        try:
-            if not os.path.exists(self.image_folder):
-                messagebox.showerror("Error", "Image folder does not exist.")
-                return
-                
-            # Find all valid image files in the directory
-            self.images = [
-                entry.path for entry in os.scandir(self.image_folder)
-                if entry.is_file() and os.path.splitext(entry.name.lower())[1] in valid_extensions
-            ]
-                    
-            if not self.images:
-                messagebox.showinfo("No Images", "No supported image files found in the selected folder.")
-                
-        except Exception as e:
-            messagebox.showerror("Error", f"Error loading images: {str(e)}")
+        # Stop the current slideshow until images from the new folder arrive
+        self.scheduler.stop()
+        self.running = False
+        self.stop_animation()
+        self.images = ImageList()
+        self.sequencer = make_sequencer(self.order)
+        self.current_image_index = 0
+        self.initial_scan_done = False
         
-    def show_image(self):
-        """Display the current image scaled to fit the window"""
-        if not self.images:
+        folders = [folder for folder in self.image_folders if is_remote(folder) or os.path.exists(folder)]
+        if not folders:
+            messagebox.showerror("Error", "Image folder does not exist.")
+            return
+        
+        self.folder_watcher = FolderWatcher(
+            folders, recursive=self.recursive, include=self.include_patterns,
+            exclude=self.exclude_patterns, interval=self.rescan_interval,
+            validate=self.metadata_index.validate, open_remote=self.host.open_remote,
+            on_scanned=self.metadata_index.save)
+        self.folder_watcher.start()
+        self.watch_timer = self.root.after(50, self.apply_folder_changes)
+
+    def stop_watching(self):
+        """Stop the background folder index"""
+        if self.folder_watcher:
+            self.folder_watcher.stop()
+            self.folder_watcher = None
+        if self.watch_timer:
+            self.root.after_cancel(self.watch_timer)
+            self.watch_timer = None
+
+    def apply_folder_changes(self):
+        """Merge images added or removed by the folder watcher into the slideshow"""
+        self.watch_timer = None
+        watcher = self.folder_watcher
+        if watcher is None or self.hidden:
             return
+        self.folder_polls += 1
+        
+        while True:
+            try:
+                added, removed, scan_complete, error = watcher.changes.get_nowait()
+            except queue.Empty:
+                break
             
-        try:
+            if error and not self.initial_scan_done:
+                messagebox.showerror("Error", f"Error loading images: {str(error)}")
+            elif error:
+                print(f"Error rescanning folder: {str(error)}")
+            if removed:
+                self.remove_images(removed)
+                self.metadata_index.forget(removed)
+            if added:
+                # Pick up the rotation where the previous session left off
+                if self.resume_entry in added and not self.running:
+                    self.current_image_index = len(self.images) + added.index(self.resume_entry)
+                    self.resume_found = True
+                self.images.extend(added)
+                self.sequencer.extend(self.image_weights_for(added))
+            if scan_complete and not self.initial_scan_done:
+                self.initial_scan_done = True
+                if not self.images and not error:
+                    messagebox.showinfo("No Images", "No supported image files found in the selected folder.")
+        
+        # Begin the slideshow as soon as the first images are known, unless we are
+        # still looking for the image to resume from
+        waiting = self.resume_entry is not None and not self.resume_found and not self.initial_scan_done
+        if self.images and not self.running and not waiting:
+            self.running = True
+            if self.resume_found and self.snapshot_photo is not None:
+                # The snapshot already shows this image, so skip decoding it now
+                self.prefetcher.schedule(self.upcoming_images(), self.get_display_size())
+            else:
+                if self.resume_entry is not None and not self.resume_found:
+                    self.current_image_index = min(self.resume_index, len(self.images) - 1)
+                elif self.resume_entry is None:
+                    self.current_image_index = self.sequencer.first()
+                self.show_image(new_slide=True)
+            self.resume_entry = None
+            self.resume_found = False
+            self.scheduler.start()
+        
+        # Poll quickly while the first scan is running, then at a relaxed pace
+        poll_ms = 100 if not self.initial_scan_done else 2000
+        self.watch_timer = self.root.after(poll_ms, self.apply_folder_changes)
+
+    def remove_images(self, entries):
+        """Remove (directory, name) pairs from the rotation without restarting it"""
+        if not self.images:
+            return
+        
+        # Keep the current position so the rotation continues where it was
+        index = self.current_image_index
+        positions = self.images.remove(entries)
+        self.sequencer.remove(positions)
+        kept_before = index - bisect.bisect_left(positions, index)
+        if not self.images:
+            self.current_image_index = 0
+            self.running = False
+            self.scheduler.stop()
+        elif index in positions:
+            # Step back one so next_image advances to the image that followed
+            self.current_image_index = (kept_before - 1) % len(self.images)
+        else:
+            self.current_image_index = kept_before
+        
+    def get_display_size(self):
+        """Return the (width, height) available for the image"""
+        window_width = self.root.winfo_width()
+        window_height = self.root.winfo_height()
+        
+        # Use geometry string if window is not fully initialized
+        if window_width <= 1 or window_height <= 1:
+            geometry = self.root.geometry().split('+')[0]
+            dimensions = geometry.split('x')
+            window_width = max(int(dimensions[0]), 300)
+            window_height = max(int(dimensions[1]), 200)
+        
+        # Account for title bar height in borderless mode
+        if self.is_borderless and hasattr(self, 'title_bar'):
+            title_height = self.title_bar.winfo_height()
+            if title_height > 0:
+                window_height -= title_height
+        
+        return max(window_width, 1), max(window_height, 1)
+
+    def handle_resize(self, event):
+        """Give immediate feedback while the window is resized and re-render once it settles"""
+        # Only process actual size changes of the main window, not position changes
+        if event.widget != self.root or (event.width, event.height) == self.window_size:
+            return
+        self.window_size = (event.width, event.height)
+        self.preview_resize()
+        
+        # The size is still changing, so push back any high-quality work
+        if self.resize_timer:
+            self.root.after_cancel(self.resize_timer)
+        self.resize_timer = self.root.after(RESIZE_SETTLE_MS, self.render_settled)
+
+    def preview_resize(self):
+        """Rescale the frame on screen with a cheap filter for the new window size"""
+        if self.current_frame is None or self.animation or self.active_transition:
+            return
+        size = self.get_display_size()
+        new_size = fit_size(self.current_frame.width, self.current_frame.height, size[0], size[1])
+        self.presenter.show(self.current_frame.resize(new_size, Image.Resampling.BILINEAR), size)
+
+    def render_settled(self):
+        """Decode the current image at the settled size on the worker, then show it"""
+        self.resize_timer = None
+        if not self.images:
+            return
+        size = self.get_display_size()
+        image_path = self.images[self.current_image_index]
+        if self.prefetcher.request(image_path, size):
+            self.resize_timer = self.root.after(15, lambda: self.wait_for_render(image_path, size))
+        else:
+            self.show_image()
+
+    def wait_for_render(self, image_path, size):
+        """Show the settled render once it is ready, unless the size or slide changed meanwhile"""
+        self.resize_timer = None
+        if (not self.images or self.get_display_size() != size
+                or self.images[self.current_image_index] != image_path):
+            return
+        if self.prefetcher.ready(image_path, size):
+            self.show_image()
+        else:
+            self.resize_timer = self.root.after(15, lambda: self.wait_for_render(image_path, size))
+
+    def upcoming_images(self):
+        """Return the paths that will be shown after the current image, in order"""
+        if not self.images:
+            return []
+        return [self.images[index]
+                for index in self.sequencer.upcoming(self.current_image_index, self.prefetcher.depth)]
+
+    def image_weight(self, directory, name):
+        """Return the weighted-order weight of an image, from its own or its folder's setting"""
+        path = os.path.join(directory, name)
+        if path in self.image_weights:
+            return self.image_weights[path]
+        # The most specific configured folder wins
+        best = None
+        for folder, weight in self.folder_weights.items():
+            folder = os.path.normpath(folder)
+            if (directory == folder or directory.startswith(folder + os.sep)) and (
+                    best is None or len(folder) > len(best[0])):
+                best = (folder, weight)
+        return best[1] if best else 1.0
+
+    def image_weights_for(self, entries):
+        """Return sequencer weights for (directory, name) pairs; only the weighted order uses them,
+        and the least recent order takes the time each image was last shown instead"""
+        if self.order == 'least_recent':
+            shown = self.host.last_shown()
+            return [shown.get(os.path.join(directory, name), 0.0) for directory, name in entries]
+        if self.order != 'weighted':
+            return [1.0] * len(entries) if isinstance(entries, list) else [1.0 for _ in entries]
+        return [self.image_weight(directory, name) for directory, name in entries]
+
+    def reset_sequencer(self):
+        """Rebuild the sequencer for the current order and image list"""
+        self.sequencer = make_sequencer(self.order)
+        self.sequencer.extend(self.image_weights_for(
+            (self.images.dirs[dir_id], name)
+            for dir_id, name in zip(self.images.dir_of, self.images.names)))
+        # Anything prefetched for the old order is no longer wanted
+        self.prefetcher.cancel()
+        if self.images:
+            self.prefetcher.schedule(self.upcoming_images(), self.get_display_size())
+
+    def show_image(self, transition=False, new_slide=False):
+        """Display the current image scaled to fit the window
+
+        new_slide counts the image as shown in the per-image statistics; re-renders
+        of the same slide, e.g. after a resize, leave it unset.
+        """
+        if not self.images:
+            return
+        
+        self.cancel_transition()
+        # Carry over a slide change that was waiting for the animation to finish its loop
+        pending = self.stop_animation()
+        size = self.get_display_size()
+        perf = self.perf
+        self.perf_sample = None
+        skipped = 0
+        while self.images:
             image_path = self.images[self.current_image_index]
-            img = Image.open(image_path)
-            
-            # Get current window dimensions
-            window_width = self.root.winfo_width()
-            window_height = self.root.winfo_height()
-            
-            # Use geometry string if window is not fully initialized
-            if window_width <= 1 or window_height <= 1:
-                geometry = self.root.geometry().split('+')[0]
-                dimensions = geometry.split('x')
-                window_width = max(int(dimensions[0]), 300)
-                window_height = max(int(dimensions[1]), 200)
-            
-            # Account for title bar height in borderless mode
-            if self.is_borderless and hasattr(self, 'title_bar'):
-                title_height = self.title_bar.winfo_height()
-                if title_height > 0:
-                    window_height -= title_height
-            
-            # Scale image to fit window while preserving aspect ratio
-            img_width, img_height = img.size
-            ratio = min(window_width/max(img_width, 1), window_height/max(img_height, 1))
-            new_width = max(int(img_width * ratio), 1)
-            new_height = max(int(img_height * ratio), 1)
+            if perf:
+                started = time.perf_counter()
+            try:
+                # Use the prefetched frame if the worker already decoded it
+                img = self.prefetcher.take(image_path, size)
+                prefetched = img is not None
+                if img is None:
+                    img = self.engine.render(image_path, size)
+            except FileNotFoundError:
+                # Deleted since the last scan: drop it and show the following image instead
+                self.remove_images([os.path.split(image_path)])
+                if self.images:
+                    self.current_image_index = self.sequencer.next(self.current_image_index)
+                continue
+            except ImageTooLargeError as e:
+                # Skip it rather than leave the slide blank, unless nothing else fits either
+                print(f"Skipping {image_path}: {str(e)}")
+                if perf:
+                    self.record_perf({'image': image_path, 'error': str(e)})
+                skipped += 1
+                if skipped >= len(self.images):
+                    break
+                self.current_image_index = self.sequencer.next(self.current_image_index)
+                continue
+            except Exception as e:
+                print(f"Error showing image: {str(e)}")
+                if perf:
+                    self.record_perf({'image': image_path, 'error': str(e)})
+                break
             
-            # Resize and display the image
-            if new_width > 0 and new_height > 0:
-                img = img.resize((new_width, new_height), Image.Resampling.LANCZOS)
+            if perf:
+                # Completed with the PhotoImage time once the frame reaches the screen
+                self.perf_sample = {
+                    'image': image_path,
+                    'prefetched': prefetched,
+                    'render_ms': (time.perf_counter() - started) * 1000,
+                    'lateness_ms': self.scheduler.lateness * 1000,
+                    'cache_hit_rate': self.engine.frame_cache.stats()['hit_rate'],
+                    **(self.engine.take_timings(image_path, size) or {}),
+                }
+                if self.host.governor:
+                    self.perf_sample['tier'] = self.host.governor.tier
+            animated = self.is_animated(image_path)
+            if transition and self.transition_style != 'none' and self.current_frame is not None:
+                def on_done(img=img, image_path=image_path):
+                    self.finish_transition()
+                    self.display_frame(img)
+                    if animated:
+                        self.start_animation(image_path, size)
                 
-                photo = ImageTk.PhotoImage(img)
-                self.current_photo = photo  # Save reference to prevent garbage collection
-                self.image_label.config(image=photo)
-                
-                # Center image in window
-                self.image_label.place(relx=0.5, rely=0.5, anchor='center')
-            
+                self.start_transition(self.current_frame, img, size, on_done)
+            else:
+                self.display_frame(img)
+                # The still frame doubles as a poster while the animation decoder warms up
+                if animated:
+                    self.start_animation(image_path, size)
+                    self.animation.on_loop_end = pending
+                    pending = None
+            self.current_frame = img
+            if new_slide:
+                self.host.record_show(image_path)
+            break
+        
+        if pending:
+            self.root.after(0, pending)
+        
+        # Adapt quality to the recent render times before queueing more work
+        self.host.check_quality()
+        # Start decoding the next slides while this one is on screen
+        self.prefetcher.schedule(self.upcoming_images(), size)
+        
+    def display_frame(self, img):
+        """Show a scaled image centered in the window"""
+        sample = self.perf_sample
+        size = self.get_display_size()
+        if sample is None:
+            self.presenter.show(img, size)
+        else:
+            self.perf_sample = None
+            start = time.perf_counter()
+            self.presenter.show(img, size)
+            sample['photo_ms'] = (time.perf_counter() - start) * 1000
+            self.record_perf(sample)
+        self.snapshot_photo = None
+        
+        # Center image in window
+        self.image_label.place(relx=0.5, rely=0.5, anchor='center')
+        self.note_first_frame()
+
+    def note_first_frame(self):
+        """Record the moment the first image appears"""
+        if not self.first_frame_shown:
+            self.first_frame_shown = True
+            STARTUP.mark("first frame shown")
+            if self.on_first_frame:
+                self.on_first_frame()
+
+    def current_image_path(self):
+        """Return the path of the image on screen, or of the one we are about to resume"""
+        if self.images:
+            return self.images[self.current_image_index]
+        if self.resume_entry:
+            return os.path.join(*self.resume_entry)
+        return ''
+
+    def show_snapshot(self):
+        """Paint the frame saved at the end of the last session, if the window size still matches"""
+        if self.snapshot_geometry != self.saved_geometry or not os.path.exists(self.snapshot_file):
+            return
+        try:
+            # Tk reads PNG natively, so this needs neither Pillow nor a full-size decode
+            self.snapshot_photo = tk.PhotoImage(file=self.snapshot_file)
+        except tk.TclError as e:
+            print(f"Error loading snapshot: {str(e)}")
+            return
+        self.image_label.config(image=self.snapshot_photo)
+        self.image_label.place(relx=0.5, rely=0.5, anchor='center')
+        self.root.after_idle(self.note_first_frame)
+
+    def save_snapshot(self):
+        """Store the frame on screen so the next launch can paint it immediately"""
+        if self.current_frame is None:
+            return
+        tmp_path = self.snapshot_file + '.tmp'
+        try:
+            frame = self.current_frame
+            if frame.mode not in ('RGB', 'RGBA'):
+                frame = frame.convert('RGBA')
+            frame.save(tmp_path, 'PNG', compress_level=1)
+            os.replace(tmp_path, self.snapshot_file)
+            self.snapshot_geometry = self.root.geometry().split('+')[0]
         except Exception as e:
-            print(f"Error showing image: {str(e)}")
+            print(f"Error saving snapshot: {str(e)}")
+
+    def start_transition(self, old_frame, new_frame, size, on_done):
+        """Animate from the frame on screen to the next one"""
+        self.active_transition = Transition(
+            self.root, self.presenter, old_frame, new_frame, size,
+            self.presenter.background, style=self.transition_style,
+            duration_ms=self.transition_ms, fps=self.transition_fps, on_done=on_done)
+        self.active_transition.start()
+
+    def finish_transition(self):
+        """Report timing for the transition that just completed"""
+        if self.active_transition and self.measure_transitions:
+            stats = self.active_transition.stats()
+            print(f"Transition {stats['style']}: {stats['frames']}/{stats['target_frames']} frames, "
+                  f"{stats['dropped']} dropped, {stats['mean_ms']:.1f} ms mean, "
+                  f"{stats['max_ms']:.1f} ms max")
+        self.active_transition = None
+
+    def skip_transition(self):
+        """Complete a running transition at once, showing the frame it leads to"""
+        if self.active_transition:
+            self.active_transition.finish()
+
+    def cancel_transition(self):
+        """Stop a transition that is still running"""
+        if self.active_transition:
+            self.active_transition.cancel()
+            self.active_transition = None
+
+    def is_animated(self, image_path):
+        """Check whether an image has more than one frame"""
+        header = self.metadata_index.get(image_path)
+        if header is not None:
+            return header[4]
+        try:
+            with Image.open(image_path) as img:
+                return img.format in ANIMATED_FORMATS and bool(getattr(img, 'is_animated', False))
+        except Exception:
+            return False
+
+    def start_animation(self, image_path, size):
+        """Play an animated image, replaying cached frames if it was fully decoded before"""
+        cache_size = size + ('animation',)
+        max_bytes = self.animation_memory_mb * 1024 * 1024
+        
+        def on_cached(frames, nbytes):
+            self.engine.frame_cache.put(image_path, cache_size, frames, nbytes=nbytes)
         
+        self.animation = AnimationPlayer(
+            self.root, self.presenter, image_path, size, self.engine.quality, max_bytes,
+            cached_frames=self.engine.frame_cache.get(image_path, cache_size), on_cached=on_cached)
+        self.animation.start()
+
+    def stop_animation(self):
+        """Stop any animation that is playing and return its pending loop-end callback"""
+        pending = None
+        if self.animation:
+            if self.animation.playing:
+                pending = self.animation.on_loop_end
+            self.animation.stop()
+            self.animation = None
+        return pending
+
     def next_image(self):
         """Move to the next image in the slideshow sequence"""
         if not self.images:
             return
+        
+        # Let an animation finish its current loop before moving on; the
+        # schedule restarts from the moment the slide actually changes
+        if self.animation and self.animation.finish_loop(self.next_image):
+            self.scheduler.stop()
+            return
             
         # Cycle to next image
-        self.current_image_index = (self.current_image_index + 1) % len(self.images)
-        self.show_image()
+        self.current_image_index = self.sequencer.next(self.current_image_index)
+        self.show_image(transition=True, new_slide=True)
         
-        # Schedule next image change
-        self.timer_id = self.root.after(self.delay, self.next_image)
+        # Called outside the scheduler, e.g. after an animation loop ended
+        if self.images and not self.scheduler.active:
+            self.scheduler.start()
     
     def add_to_startup(self):
         """Add application to Windows startup"""
@@ -545,7 +4027,8 @@ class ImageWidget:
             # Create shortcut path
             shortcut_path = os.path.join(startup_folder, "MotivationWidget.lnk")
             
-            # Create Windows shortcut
+            # Create Windows shortcut; pywin32 is only loaded when it is needed
+            import win32com.client
             shell = win32com.client.Dispatch("WScript.Shell")
             shortcut = shell.CreateShortCut(shortcut_path)
             shortcut.Targetpath = exe_path
@@ -580,38 +4063,194 @@ class ImageWidget:
         except Exception as e:
             messagebox.showerror("Error", f"Error removing from startup: {str(e)}")
             
+    def shutdown(self):
+        """Save this window's state and stop its timers and background work"""
+        self.save_snapshot()
+        self.save_config()
+        self.stop_watching()
+        self.scheduler.stop()
+        self.stop_animation()
+        self.prefetcher.shutdown()
+        if self.perf:
+            self.perf.close()
+
+    def new_window(self):
+        """Open another widget window sharing this process's decoder and caches"""
+        self.menu.unpost()
+        self.menu_showing = False
+        self.host.new_window(self)
+
+    def close_window(self):
+        """Close a secondary window and forget its profile; the main window exits instead"""
+        if self.menu_showing:
+            self.menu.unpost()
+            self.menu_showing = False
+        if self.profile is None:
+            self.exit_app()
+            return
+        self.shutdown()
+        self.host.forget(self)
+        if os.path.exists(self.snapshot_file):
+            os.remove(self.snapshot_file)
+        self.root.destroy()
+
     def exit_app(self):
         """Save settings and exit the application"""
         # Hide menu if showing
         if self.menu_showing:
             self.menu.unpost()
             self.menu_showing = False
-            
-        self.save_config()
-        self.root.quit()
+        self.host.exit()
+
+def parse_args(argv=None):
+    """Parse command line options"""
+    parser = argparse.ArgumentParser(description="Motivation Widget image slideshow")
+    parser.add_argument('--benchmark', nargs='+', metavar='FOLDER',
+                        help="render the images in FOLDER headlessly and report timings, then exit")
+    parser.add_argument('--size', default='800x600',
+                        help="benchmark target size, or window size for --warm with folders, "
+                             "as WIDTHxHEIGHT (default 800x600)")
+    parser.add_argument('--repeat', type=int, default=3, help="benchmark passes over the folder")
+    parser.add_argument('--quality', choices=list(RESAMPLE_FILTERS), default='lanczos',
+                        help="benchmark resample filter")
+    parser.add_argument('--recursive', action='store_true',
+                        help="include subfolders in the benchmark or --warm folders")
+    parser.add_argument('--frame-cache-mb', type=int, default=0,
+                        help="benchmark with an in-memory frame cache of this size")
+    parser.add_argument('--warm', nargs='*', metavar='FOLDER',
+                        help="build the preview cache for FOLDER, or for every configured window's "
+                             "folders and size if none is given, then exit")
+    parser.add_argument('--workers', type=int,
+                        help="processes used by --warm (default: one per CPU)")
+    parser.add_argument('--json', action='store_true', help="print benchmark or warm-up results as JSON")
+    parser.add_argument('--startup-report', action='store_true',
+                        help="print a startup timeline once the first image is shown, then exit")
+    parser.add_argument('--startup-budget-ms', type=float,
+                        help="with --startup-report, exit with status 1 if the first image "
+                             "takes longer than this")
+    return parser.parse_args(argv)
+
+
+def print_benchmark(result):
+    """Print benchmark results as a short human-readable report"""
+    print(f"{result['frames']} frames from {result['images']} images at "
+          f"{result['size'][0]}x{result['size'][1]} ({result['quality']}), "
+          f"{result['failures']} failures")
+    if result['frames']:
+        print(f"latency  p50 {result['p50_ms']:.2f} ms  p90 {result['p90_ms']:.2f} ms  "
+              f"p99 {result['p99_ms']:.2f} ms  max {result['max_ms']:.2f} ms")
+    print(f"throughput {result['throughput_fps']:.1f} frames/s")
+    print(f"peak RSS {result['peak_rss_mb']:.1f} MB")
+    cache = result['frame_cache']
+    if cache['max_bytes']:
+        print(f"frame cache hit rate {cache['hit_rate']:.0%} "
+              f"({cache['hits']} hits, {cache['misses']} misses, {cache['evictions']} evictions)")
+
+
+def print_warm(result):
+    """Print a warm-up report"""
+    print(f"{result['files']} images, {result['cached']} already cached, {result['processed']} processed: "
+          f"{result['built']} previews built, {result['small']} small enough to need none, "
+          f"{result['unreadable']} unreadable, {result['missing']} missing, {result['failed']} failed")
+    for path, error in result['errors']:
+        print(f"  {path}: {error}")
+    print(f"{result['files_per_s']:.1f} files/s over {result['elapsed_s']:.1f} s")
+    mb = 1024 * 1024
+    print(f"{result['source_bytes'] / mb:.1f} MB of originals served by {result['preview_bytes'] / mb:.1f} MB "
+          f"of previews, {result['bytes_saved'] / mb:.1f} MB saved")
+    print(f"cache holds {result['cache_bytes'] / mb:.1f} MB of {result['cache_max_bytes'] / mb:.0f} MB"
+          + (", pruned to fit; raise preview_cache_mb to keep every preview" if result['pruned'] else ""))
+
 
 # Create and run application
 if __name__ == "__main__":
+    # Lets the --warm process pool start in a PyInstaller build; its worker
+    # processes always get arguments, a normal launch of the widget has none
+    if getattr(sys, 'frozen', False) and len(sys.argv) > 1:
+        import multiprocessing
+        multiprocessing.freeze_support()
+    args = parse_args()
+    if args.warm is not None:
+        config_dir = os.path.expanduser("~")
+        library = open_library(config_dir)
+        config = library.load_settings()
+        metadata_index = MetadataIndex(library)
+        metadata_index.load()
+        max_bytes = max(int(config.get('preview_cache_mb', 512)), 0) * 1024 * 1024
+        if not max_bytes:
+            sys.exit("The preview cache is disabled (preview_cache_mb is 0)")
+        if args.warm:
+            size = tuple(int(v) for v in args.size.lower().split('x'))
+            targets = [(args.warm, args.recursive, [], [], size)]
+        else:
+            targets = list(configured_targets(config))
+        result = warm_library(
+            targets, os.path.join(config_dir, "motivation_widget_cache"), max_bytes, workers=args.workers,
+            memory_limit=max(int(config.get('decode_memory_mb', DECODE_MEMORY_LIMIT // (1024 * 1024))), 16)
+            * 1024 * 1024,
+            max_pixels=max(int(config.get('max_image_megapixels', MAX_SOURCE_PIXELS // 1000000)), 1) * 1000000,
+            metadata_index=metadata_index, progress=None if args.json else
+            lambda done, total: print(f"{done}/{total}", file=sys.stderr))
+        metadata_index.save()
+        library.close()
+        if args.json:
+            print(json.dumps(result, indent=2))
+        else:
+            print_warm(result)
+        sys.exit(1 if result['failed'] else 0)
+    
+    if args.benchmark:
+        size = tuple(int(v) for v in args.size.lower().split('x'))
+        result = run_benchmark(args.benchmark, size, repeat=args.repeat, quality=args.quality,
+                               recursive=args.recursive, frame_cache_mb=args.frame_cache_mb)
+        if args.json:
+            print(json.dumps(result, indent=2))
+        else:
+            print_benchmark(result)
+        sys.exit(1 if result['failures'] else 0)
+    
+    STARTUP.mark("arguments parsed")
     root = tk.Tk()
-    app = ImageWidget(root)
+    STARTUP.mark("window created")
+    exit_status = [0]
+    
+    def report_startup(status=0):
+        """Print the startup timeline, check it against the budget and quit"""
+        first_frame = STARTUP.elapsed_ms("first frame shown")
+        print(STARTUP.report())
+        if first_frame is None:
+            print("No image was shown")
+        elif args.startup_budget_ms is not None:
+            within = first_frame <= args.startup_budget_ms
+            print(f"Time to first frame {first_frame:.1f} ms, budget {args.startup_budget_ms:.1f} ms: "
+                  f"{'OK' if within else 'OVER BUDGET'}")
+            status = status or (0 if within else 1)
+        exit_status[0] = status
+        root.quit()
+    
+    host = WidgetHost(root)
+    app = ImageWidget(root, on_first_frame=report_startup if args.startup_report else None, host=host)
+    STARTUP.mark("widget created")
+    if args.startup_report:
+        # Give up if no folder is configured or nothing can be shown
+        root.after(30000, lambda: report_startup(2))
     
     # Set minimum window size
     root.minsize(300, 200)
     
-    # Handle window resize with debouncing to prevent lag
-    def on_resize(event):
-        # Only process actual size changes, not position changes
-        if event.widget == root and (event.width != root.winfo_width() or event.height != root.winfo_height()):
-            # Cancel any pending resize timer
-            if app.resize_timer:
-                root.after_cancel(app.resize_timer)
-            
-            # Schedule resize with delay to prevent multiple rapid calls
-            app.resize_timer = root.after(100, app.show_image)
+    # Handle window resize: fast preview while dragging, full render once it settles
+    root.bind("<Configure>", app.handle_resize)
+    root.protocol("WM_DELETE_WINDOW", app.exit_app)
     
-    root.bind("<Configure>", on_resize)
+    # Further windows saved as profiles share the decoder and caches of this one
+    host.open_profiles()
     
     # Ensure window is fully rendered before showing images
     root.update_idletasks()
+    STARTUP.mark("window drawn")
+    
+    # Load Pillow while the event loop starts; the first decode waits for it if needed
+    threading.Thread(target=preload_imaging, name="preload", daemon=True).start()
     
-    root.mainloop()
\ No newline at end of file
+    root.mainloop()
+    sys.exit(exit_status[0])
\ No newline at end of file